@@ -1,27 +1,98 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-from flask import Flask, send_file
-from gtts import gTTS
+from flask import Flask, render_template, request, redirect, url_for, flash, make_response
+from flask import send_from_directory
 from twilio.rest import Client
 import os
 import json
-import requests
 from bs4 import BeautifulSoup
-import schedule
-import time
 import threading
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import re
 import logging
 import io
+from tts_cache import TTSCache
+from tts_backends import get_backend
+from broadcast import BroadcastEngine
+from broadcast_runs import BroadcastRuns
+from delivery_window import DeliveryWindow
+from rate_limiter import TokenBucket
+from db import Database
+from outbox import Outbox
+from farmer_store import FarmerStore, normalize_district
+from notice_store import NoticeStore, make_notice_id
+from audio_catalog import AudioCatalog
+from scraper import FEED_URL, fetch_feed, notice_id_for
+from pipeline import Pipeline, Stage
+from async_dispatch import AsyncDispatcher, TWILIO_API_BASE_URL, aiohttp
+from scheduler import Scheduler
+from leader import LeaderLease
+from ledger import DeliveryLedger, normalize_farmer
+from digest import DigestBuilder
+from gazetteer import Gazetteer
+from jobs import JobQueue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'static/audio/'
+app.config['AUDIO_MAX_AGE'] = int(os.environ.get('AUDIO_MAX_AGE', 365 * 24 * 3600))
+# Let a fronting server (nginx/Apache) stream files via X-Sendfile when configured
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '0') == '1'
 app.config['FARMERS_FILE'] = 'farmers.json'
 app.config['NOTICES_FILE'] = 'notices.json'
+app.config['NOTICES_LOG'] = 'notices.jsonl'
 app.config['LAST_SCRAPE_FILE'] = 'last_scrape.json'
+app.config['NOTICES_FEED_URL'] = os.environ.get('NOTICES_FEED_URL', FEED_URL)
+app.config['SCRAPER_TTS_WORKERS'] = int(os.environ.get('SCRAPER_TTS_WORKERS', 4))
+app.config['SCRAPER_PERSIST_BATCH'] = int(os.environ.get('SCRAPER_PERSIST_BATCH', 10))
+app.config['TTS_CACHE_MAX_BYTES'] = int(os.environ.get('TTS_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+app.config['TTS_CACHE_MAX_AGE'] = int(os.environ.get('TTS_CACHE_MAX_AGE', 30 * 24 * 3600))
+# Cache entries used this recently are never evicted; longer than any outbox hold
+# (a day for the delivery window and quiet hours, plus retry backoff)
+app.config['TTS_CACHE_MIN_AGE'] = int(os.environ.get('TTS_CACHE_MIN_AGE', 2 * 24 * 3600))
+# Speech engine for this deployment: gtts (network), espeak (offline) or fake (tests)
+app.config['TTS_BACKEND'] = os.environ.get('TTS_BACKEND', 'gtts')
+# Texts are synthesized one sentence per cache entry (shared sentences are reused); longer sentences are split at this many characters
+app.config['TTS_CHUNK_CHARS'] = int(os.environ.get('TTS_CHUNK_CHARS', 200))
+app.config['TTS_CHUNK_WORKERS'] = int(os.environ.get('TTS_CHUNK_WORKERS', 4))
+app.config['BROADCAST_WORKERS'] = int(os.environ.get('BROADCAST_WORKERS', 8))
+app.config['BROADCAST_QUEUE_SIZE'] = int(os.environ.get('BROADCAST_QUEUE_SIZE', 1000))
+app.config['BROADCAST_BATCH_SIZE'] = int(os.environ.get('BROADCAST_BATCH_SIZE', 100))
+app.config['TWILIO_MESSAGES_PER_SECOND'] = float(os.environ.get('TWILIO_MESSAGES_PER_SECOND', 10))
+app.config['TWILIO_BURST'] = int(os.environ.get('TWILIO_BURST', 20))
+app.config['DATABASE'] = os.environ.get('DATABASE_PATH', 'agrivoice.db')
+app.config['OUTBOX_WORKERS'] = int(os.environ.get('OUTBOX_WORKERS', 4))
+app.config['OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 6))
+# Seconds of rate-limited sends claimed ahead; bounds how long a priority message can wait behind bulk traffic
+app.config['OUTBOX_MAX_BACKLOG'] = float(os.environ.get('OUTBOX_MAX_BACKLOG', 2))
+# Days sent and failed messages are kept in the outbox before being pruned
+app.config['OUTBOX_RETENTION_DAYS'] = float(os.environ.get('OUTBOX_RETENTION_DAYS', 7))
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['ASYNC_DISPATCH'] = os.environ.get('ASYNC_DISPATCH', '1') == '1'
+app.config['DISPATCH_MAX_IN_FLIGHT'] = int(os.environ.get('DISPATCH_MAX_IN_FLIGHT', 200))
+app.config['TWILIO_API_BASE_URL'] = os.environ.get('TWILIO_API_BASE_URL', TWILIO_API_BASE_URL)
+# Optional district/alias/crop list used to tag notices, e.g. {"districts": {"Patna": "Bihar"}}
+app.config['GAZETTEER_FILE'] = os.environ.get('GAZETTEER_FILE', 'gazetteer.json')
+# How many of the newest notices to look through for a district's latest ones
+app.config['DISTRICT_NOTICE_SCAN'] = int(os.environ.get('DISTRICT_NOTICE_SCAN', 2000))
+# Languages notices are voiced in (gTTS codes, limited to CONTENT_LANGUAGES); the first is the default for farmers
+app.config['NOTICE_LANGUAGES'] = [lang.strip() for lang in os.environ.get('NOTICE_LANGUAGES', 'hi').split(',') if lang.strip()]
+app.config['RENDER_WORKERS'] = int(os.environ.get('RENDER_WORKERS', 4))
+# Send a farmer's notices as one combined voice message instead of one message per notice
+app.config['DIGEST_MODE'] = os.environ.get('DIGEST_MODE', '1') == '1'
+# Background job schedules: 'every 6h', 'daily 09:00' or a 5-field cron expression
+app.config['SCHEDULER_STATE_FILE'] = os.environ.get('SCHEDULER_STATE_FILE', 'scheduler_state.json')
+app.config['SCRAPE_SCHEDULE'] = os.environ.get('SCRAPE_SCHEDULE', 'every 6h')
+app.config['AUDIO_SEND_SCHEDULE'] = os.environ.get('AUDIO_SEND_SCHEDULE', 'daily 09:00')
+app.config['SCHEDULE_JITTER'] = int(os.environ.get('SCHEDULE_JITTER', 60))
+# Scheduled broadcasts are spread over this window; bulk messages are held through quiet hours
+app.config['DELIVERY_WINDOW'] = os.environ.get('DELIVERY_WINDOW', '09:00-11:00')
+app.config['QUIET_HOURS'] = os.environ.get('QUIET_HOURS', '21:00-07:00')
+# Only the worker holding this lease runs scheduled jobs; others take over within the TTL if it dies
+app.config['LEADER_LEASE_TTL'] = int(os.environ.get('LEADER_LEASE_TTL', 30))
 
 # Import credentials from config file
 try:
@@ -77,12 +148,6 @@ except Exception as e:
     logging.error(f"Twilio client initialization failed: {e}")
     client = None
 
-# Initialize JSON files if they don't exist
-for file_path in [app.config['FARMERS_FILE'], app.config['NOTICES_FILE']]:
-    if not os.path.exists(file_path):
-        with open(file_path, 'w') as f:
-            json.dump([], f)
-
 if not os.path.exists(app.config['LAST_SCRAPE_FILE']):
     with open(app.config['LAST_SCRAPE_FILE'], 'w') as f:
         json.dump({"last_notice_id": ""}, f)
@@ -90,130 +155,340 @@ if not os.path.exists(app.config['LAST_SCRAPE_FILE']):
 # Ensure static/audio directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-def send_whatsapp_message(phone_number, message_body, media_url=None):
+db = Database(app.config['DATABASE'])
+
+# Generated audio files are cataloged as they are written (existing files once on first run)
+audio_catalog = AudioCatalog(db, app.config['UPLOAD_FOLDER'])
+audio_catalog.backfill()
+
+# Synthesized speech is cached by content so each text is generated only once
+tts_cache = TTSCache(
+    app.config['UPLOAD_FOLDER'],
+    max_bytes=app.config['TTS_CACHE_MAX_BYTES'],
+    max_age=app.config['TTS_CACHE_MAX_AGE'],
+    min_age=app.config['TTS_CACHE_MIN_AGE'],
+    backend=get_backend(app.config['TTS_BACKEND']),
+    chunk_chars=app.config['TTS_CHUNK_CHARS'],
+    chunk_workers=app.config['TTS_CHUNK_WORKERS'],
+    # Cache entries are not sendable audio; only drop catalog rows an older version recorded for them
+    on_evict=audio_catalog.remove
+)
+
+# Shared worker pool for all per-farmer broadcast work
+broadcast_engine = BroadcastEngine(
+    workers=app.config['BROADCAST_WORKERS'],
+    queue_size=app.config['BROADCAST_QUEUE_SIZE']
+)
+
+# Every Twilio send, from any thread, takes a token from this shared limiter
+twilio_rate_limiter = TokenBucket(app.config['TWILIO_MESSAGES_PER_SECOND'], app.config['TWILIO_BURST'])
+
+# Registered farmers live in SQLite; an existing farmers.json is imported once
+farmer_store = FarmerStore(db)
+farmer_store.migrate_from_json(app.config['FARMERS_FILE'])
+
+# Notices are kept in an append-only log; an existing notices.json is imported once
+notice_store = NoticeStore(app.config['NOTICES_LOG'])
+notice_store.migrate_from_json(app.config['NOTICES_FILE'])
+
+# Notices are tagged with the districts, states and crops they mention, so they only reach those farmers
+gazetteer = Gazetteer(app.config['GAZETTEER_FILE'])
+
+# Each notice is voiced once per language at ingest; broadcasts only pick the farmer's rendering
+render_executor = ThreadPoolExecutor(max_workers=app.config['RENDER_WORKERS'], thread_name_prefix='render')
+
+LANGUAGE_NAMES = {
+    'hi': 'हिन्दी', 'en': 'English', 'mr': 'मराठी', 'bn': 'বাংলা', 'gu': 'ગુજરાતી', 'pa': 'ਪੰਜਾਬੀ',
+    'ta': 'தமிழ்', 'te': 'తెలుగు', 'kn': 'ಕನ್ನಡ', 'ml': 'മലയാളം', 'ur': 'اردو', 'ne': 'नेपाली',
+}
+
+# Notices (from the feed and the admin form) are written in Hindi. Another voice would only read
+# the Hindi text with a foreign accent, so farmers can only choose languages there is content in
+CONTENT_LANGUAGES = {'hi'}
+unsupported_languages = [lang for lang in app.config['NOTICE_LANGUAGES'] if lang not in CONTENT_LANGUAGES]
+if unsupported_languages:
+    logging.warning(f"Ignoring NOTICE_LANGUAGES without notice content: {', '.join(unsupported_languages)}")
+    app.config['NOTICE_LANGUAGES'] = [lang for lang in app.config['NOTICE_LANGUAGES'] if lang in CONTENT_LANGUAGES] or ['hi']
+
+# Bulk sends go out in per-farmer slots within the delivery window, never in quiet hours
+delivery_window = DeliveryWindow(app.config['DELIVERY_WINDOW'], app.config['QUIET_HOURS'])
+
+# Every broadcast records what each farmer was sent, so nothing is delivered to them twice
+delivery_ledger = DeliveryLedger(db)
+
+# Combined voice messages, shared by every farmer receiving the same notices
+digest_builder = DigestBuilder(app.config['UPLOAD_FOLDER'])
+
+def deliver_whatsapp_message(phone_number, message_body, media_url=None):
     """
-    Send a WhatsApp message to a specific phone number
-    Returns True if successful, False otherwise
+    Make the Twilio API call for one message (used by the outbox workers)
+    Returns the message SID, raises on failure
+    """
+    message_params = {
+        'from_': whatsapp_number,
+        'body': message_body,
+        'to': phone_number
+    }
+    
+    if media_url:
+        message_params['media_url'] = media_url
+        
+    twilio_rate_limiter.acquire()
+    message = client.messages.create(**message_params)
+    return message.sid
+
+def send_whatsapp_message(phone_number, message_body, media_url=None, item_id=None, job_id=None, lane='bulk', send_at=None):
+    """
+    Queue a WhatsApp message to a specific phone number in the durable outbox
+    With item_id, the message is skipped if the farmer already has that item
+    (a list of item ids marks a message carrying several items, such as a digest)
+    job_id ties the message to a background job for progress reporting
+    lane is the outbox priority lane: interactive, manual or bulk
+    Bulk messages are held until send_at (epoch seconds) and past quiet hours
+    Returns True if the message was queued (or already delivered), False otherwise
     """
     if not client:
         logging.warning(f"Skipping WhatsApp message to {phone_number} - Twilio client not initialized")
         return False
     
+    idempotency_key = None
     try:
+        if isinstance(item_id, list):
+            idempotency_key = delivery_ledger.claim_all(phone_number, item_id)
+            if not idempotency_key:
+                logging.info(f"Skipping {len(item_id)} items for {phone_number} - already delivered")
+                return True
+        elif item_id:
+            idempotency_key = delivery_ledger.claim(phone_number, item_id)
+            if not idempotency_key:
+                logging.info(f"Skipping {item_id} for {phone_number} - already delivered")
+                return True
+        
         # Format the phone number correctly for WhatsApp
         if not phone_number.startswith('whatsapp:'):
             phone_number = f'whatsapp:{phone_number}'
         
-        message_params = {
-            'from_': whatsapp_number,
-            'body': message_body,
-            'to': phone_number
-        }
-        
-        if media_url:
-            message_params['media_url'] = media_url
-            
-        message = client.messages.create(**message_params)
-        logging.info(f"Sent WhatsApp message to {phone_number}: SID {message.sid}")
+        delay = delivery_window.delay(send_at, key=normalize_farmer(phone_number)) if lane == 'bulk' else 0
+        outbox.enqueue(phone_number, message_body, media_url, delay=delay,
+                       idempotency_key=idempotency_key, job_id=job_id, lane=lane)
         return True
     except Exception as e:
-        logging.error(f"Failed to send WhatsApp message to {phone_number}: {e}")
+        logging.error(f"Failed to queue WhatsApp message to {phone_number}: {e}")
+        if idempotency_key:
+            delivery_ledger.mark_failed(idempotency_key, e)
         return False
 
-def send_whatsapp_voice_note(phone_number, text_to_speak, message_body=None):
+# Spoken at the start of every digest; generic so one rendering is shared by all farmers
+DIGEST_WELCOME_TEXT = "नमस्ते! आपका AGRIVOICE में स्वागत है। यहां आपके लिए नवीनतम कृषि सूचनाएँ हैं।"
+
+def tag_notice(notice):
     """
-    Send a WhatsApp voice note by converting text to speech
-    Returns True if successful, False otherwise
+    Tag a notice with the districts, states and crops its text mentions
+    """
+    notice['tags'] = gazetteer.tag(notice['text'])
+    return notice
+
+def notice_targets_district(notice, district):
+    """
+    Whether a notice should reach farmers in district (untagged and national notices reach everyone)
+    """
+    districts = gazetteer.target_districts(notice.get('tags'))
+    return districts is None or (district or '').strip().lower() in {d.lower() for d in districts}
+
+def farmers_for_notice(notice):
+    """
+    Yield the farmers a notice is routed to: everyone for national notices,
+    otherwise the farmers of its target districts via the district index
+    """
+    districts = gazetteer.target_districts(notice.get('tags'))
+    if districts is None:
+        yield from farmer_store.iter_all()
+        return
+    for district in districts:
+        yield from farmer_store.iter_by_district(district)
+
+@lru_cache(maxsize=1024)
+def cached_district_notices(count, district, state_token):
+    """
+    Newest count notices routed to district for a given notice log state,
+    shared by every farmer of the district in a broadcast. Pages back
+    through the log until count are found or DISTRICT_NOTICE_SCAN notices
+    have been looked at.
+    """
+    found, cursor, scanned = [], None, 0
+    while len(found) < count and scanned < app.config['DISTRICT_NOTICE_SCAN']:
+        page, cursor = notice_store.page(before=cursor, limit=100)
+        scanned += len(page)
+        found.extend(notice for notice in page if notice_targets_district(notice, district))
+        if cursor is None:
+            break
+    return tuple(found[:count])
+
+def get_latest_notices(count=3, district=None):
+    """
+    Get the latest notices from the notice log
+    With a district, only notices routed to that district are considered
+    Returns a list of the latest 'count' notices, newest first
     """
-    if not client:
-        logging.warning(f"Skipping WhatsApp voice note to {phone_number} - Twilio client not initialized")
-        return False
-    
     try:
-        # Format the phone number correctly for WhatsApp
-        if not phone_number.startswith('whatsapp:'):
-            phone_number = f'whatsapp:{phone_number}'
-        
-        # Generate audio from text
-        tts = gTTS(text=text_to_speak, lang='hi')
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        audio_filename = f'voice_note_{timestamp}.mp3'
-        audio_path = os.path.join(app.config['UPLOAD_FOLDER'], audio_filename)
-        tts.save(audio_path)
-        
-        # Create media URL for the voice note
-        media_url = f'{server_url}/static/audio/{audio_filename}'
-        
-        # Default message body if none provided
-        if not message_body:
-            message_body = "कृषि सूचना वॉइस नोट"  # "Agriculture information voice note" in Hindi
-        
-        # Send the voice note as a media message
-        message = client.messages.create(
-            from_=whatsapp_number,
-            body=message_body,
-            media_url=media_url,
-            to=phone_number
-        )
-        
-        logging.info(f"Sent WhatsApp voice note to {phone_number}: SID {message.sid}")
+        if district is None:
+            return notice_store.latest(count)
+        return list(cached_district_notices(count, normalize_district(district), notice_store.state_token()))
+    except Exception as e:
+        logging.error(f"Error getting latest notices: {e}")
+        return []
+
+def get_recent_audio_files(count=3):
+    """
+    Get the most recent notice audio files from the audio catalog (TTS cache
+    entries and digests are never sendable files on their own)
+    Returns a list of dicts with 'filename', 'path' and 'created', newest first
+    """
+    try:
+        return audio_catalog.recent(count, kind='notice')
+    except Exception as e:
+        logging.error(f"Error getting recent audio files: {e}")
+        return []
+
+def default_language():
+    return app.config['NOTICE_LANGUAGES'][0] if app.config['NOTICE_LANGUAGES'] else 'hi'
+
+def farmer_language(lang):
+    """
+    The language to voice notices in for a farmer: their choice if notices are available in it
+    """
+    return lang if lang in app.config['NOTICE_LANGUAGES'] else default_language()
+
+def materialize_render(notice, lang):
+    """
+    Write a notice voiced in lang to its own permanent file (cache eviction
+    never removes it) and return the filename
+    """
+    filename = notice_audio_filename(notice['id'], notice.get('time', ''), lang)
+    path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if not os.path.exists(path):
+        tts_cache.materialize(notice['text'], path, lang=lang)
+        audio_catalog.record(filename, notice_id=notice['id'], kind='render')
+    return filename
+
+def render_notice(notice):
+    """
+    Voice a notice once per configured language, in parallel
+    Stores {language: filename} in notice['renders']
+    """
+    futures = {
+        lang: render_executor.submit(materialize_render, notice, lang)
+        for lang in app.config['NOTICE_LANGUAGES'] if lang != 'hi' or not notice.get('audio')
+    }
+    notice['renders'] = {lang: future.result() for lang, future in futures.items()}
+    if notice.get('audio') and 'hi' in app.config['NOTICE_LANGUAGES']:
+        notice['renders']['hi'] = notice['audio']
+    return notice
+
+def notice_render(notice, lang):
+    """
+    Filename of a notice voiced in lang: the permanent file made at ingest,
+    or one made now for notices stored before the language was added
+    """
+    filename = notice.get('renders', {}).get(lang)
+    if lang == 'hi' and notice.get('audio'):
+        filename = notice['audio']
+    if filename and filename.startswith('notice_') and os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+        return filename
+    return materialize_render(notice, lang)
+
+def notice_audio_path(notice, lang='hi'):
+    """
+    Path of a notice's permanent audio file voiced in lang
+    """
+    return os.path.join(app.config['UPLOAD_FOLDER'], notice_render(notice, lang))
+
+def send_notice_voice_note(phone_number, notice, message_body, lang=None, job_id=None, lane='bulk'):
+    """
+    Send a notice's pre-rendered voice note in the farmer's language
+    """
+    lang = farmer_language(lang)
+    item_id = f"notice:{notice['id']}"
+    if delivery_ledger.has(phone_number, item_id):
+        logging.info(f"Skipping {item_id} for {phone_number} - already delivered")
         return True
+    try:
+        media_url = f'{server_url}/audio/{notice_render(notice, lang)}'
     except Exception as e:
-        logging.error(f"Failed to send WhatsApp voice note to {phone_number}: {e}")
+        logging.error(f"Failed to render notice {notice['id']} in {lang} for {phone_number}: {e}")
         return False
+    return send_whatsapp_message(phone_number, message_body, media_url, item_id=item_id, job_id=job_id, lane=lane)
 
-def get_latest_notices(count=3):
+def send_digest_to_farmer(phone_number, farmer_name, notices, lang=None, lane='bulk'):
     """
-    Get the latest notices from the notices.json file
-    Returns a list of the latest 'count' notices
+    Send the notices the farmer has not received yet as one voice message:
+    a spoken welcome followed by each notice, pre-rendered once per set of
+    notices and language
     """
+    lang = farmer_language(lang)
+    notices = [notice for notice in notices if not delivery_ledger.has(phone_number, f"notice:{notice['id']}")]
+    if not notices:
+        logging.info(f"{phone_number} already has the latest notices")
+        return True
+    
     try:
-        with open(app.config['NOTICES_FILE'], 'r') as f:
-            notices = json.load(f)
-        
-        # Sort notices by time in descending order (newest first)
-        notices.sort(key=lambda x: x.get('time', ''), reverse=True)
-        
-        # Return the latest 'count' notices
-        return notices[:count]
+        welcome_audio = tts_cache.get_or_create(DIGEST_WELCOME_TEXT, lang=lang)
+        parts = [os.path.join(app.config['UPLOAD_FOLDER'], welcome_audio)]
+        parts += [notice_audio_path(notice, lang) for notice in notices]
+        digest_filename = digest_builder.build(parts)
     except Exception as e:
-        logging.error(f"Error getting latest notices: {e}")
-        return []
+        logging.error(f"Failed to build notice digest for {phone_number}: {e}")
+        return False
+    
+    # The digest carries the notices and their audio files, so they are recorded as delivered together
+    item_ids = [f"notice:{notice['id']}" for notice in notices]
+    item_ids += [f"audio:{notice['audio']}" for notice in notices if 'audio' in notice]
+    message_body = f"नमस्ते {farmer_name}! आपके लिए {len(notices)} नवीनतम कृषि सूचनाएँ"  # "Hello! N latest agriculture notices for you"
+    return send_whatsapp_message(phone_number, message_body, f'{server_url}/audio/{digest_filename}', item_id=item_ids, lane=lane)
 
-def send_latest_notices_to_farmer(phone_number, farmer_name):
+def send_latest_notices_to_farmer(phone_number, farmer_name, district=None, lang=None, lane='bulk'):
     """
-    Send the latest 3 notices to a specific farmer as voice notes
+    Send the latest 3 notices for the farmer's district to a specific farmer as
+    voice notes in their language (or a single digest in digest mode),
+    skipping any the farmer has already received
     """
-    latest_notices = get_latest_notices(3)
+    latest_notices = get_latest_notices(3, district)
     
     if not latest_notices:
         logging.warning(f"No notices available to send to {phone_number}")
         return False
     
+    if app.config['DIGEST_MODE']:
+        return send_digest_to_farmer(phone_number, farmer_name, latest_notices, lang, lane)
+    
+    item_ids = [f"notice:{notice['id']}" for notice in latest_notices]
+    item_ids += [f"audio:{notice['audio']}" for notice in latest_notices if 'audio' in notice]
+    if not delivery_ledger.pending(phone_number, item_ids):
+        logging.info(f"{phone_number} already has the latest notices")
+        return True
+    
     # Send welcome message first
     welcome_message = f"नमस्ते {farmer_name}! आपका AGRIVOICE में स्वागत है। यहां आपके लिए नवीनतम कृषि सूचनाएँ हैं:"
-    send_whatsapp_message(phone_number, welcome_message)
+    send_whatsapp_message(phone_number, welcome_message, lane=lane)
     
-    # Send each notice as a voice note with a small delay to avoid rate limiting
+    # Send each notice as a voice note (pacing is handled by the shared rate limiter)
     for i, notice in enumerate(latest_notices):
         try:
             # Send as voice note
             message_body = f"सूचना {i+1}/3"  # "Notice 1/3" in Hindi
-            send_whatsapp_voice_note(phone_number, notice['text'], message_body)
+            send_notice_voice_note(phone_number, notice, message_body, lang, lane=lane)
             
             # Also send the original audio file if available
             if 'audio' in notice:
-                media_url = f"{server_url}/static/audio/{notice['audio']}"
-                send_whatsapp_message(phone_number, f"सूचना {i+1}/3 का ऑडियो", media_url)
-            
-            time.sleep(2)  # Small delay between messages
+                media_url = f"{server_url}/audio/{notice['audio']}"
+                send_whatsapp_message(phone_number, f"सूचना {i+1}/3 का ऑडियो", media_url, item_id=f"audio:{notice['audio']}", lane=lane)
             
         except Exception as e:
             logging.error(f"Error sending notice to {phone_number}: {e}")
     
     return True
 
-def send_voice_notices_to_all_farmers():
+def send_voice_notices_to_all_farmers(lane='bulk'):
     """
     Send the latest 3 notices as voice notes to all registered farmers
     """
@@ -224,177 +499,243 @@ def send_voice_notices_to_all_farmers():
         return False
     
     try:
-        with open(app.config['FARMERS_FILE'], 'r') as f:
-            farmers = json.load(f)
-        
-        if not farmers:
+        if not farmer_store.count():
             logging.warning("No farmers registered to send notices to")
             return False
         
-        for farmer in farmers:
-            threading.Thread(
-                target=send_latest_notices_to_farmer, 
-                args=(farmer['phone'], farmer['name']), 
-                daemon=True
-            ).start()
-            time.sleep(1)  # Small delay between farmers to avoid rate limiting
-        
-        logging.info(f"Started sending voice notices to {len(farmers)} farmers")
+        broadcast_runs.start('latest_notices', {'lane': lane})
         return True
     except Exception as e:
         logging.error(f"Error sending voice notices to farmers: {e}")
         return False
 
+def dedupe_scraped_notice(item):
+    """
+    Pipeline stage: turn a feed item into a notice record, dropping notices already stored
+    """
+    notice_id = f"agriwelfare-{notice_id_for(item)}"
+    if notice_store.contains(notice_id):
+        return None
+    
+    return tag_notice({
+        'id': notice_id,
+        'text': f"{item.get('Title', '')} - Published on {item.get('PublishDate', '')}",
+        'time': datetime.now().strftime('%Y%m%d%H%M%S'),
+        'source': 'agriwelfare.gov.in',
+        'original_link': item.get('FilePath', '')
+    })
+
+def notice_audio_filename(notice_id, timestamp, lang='hi'):
+    """
+    Audio file name for a notice voiced in lang; the id keeps notices created in the same second apart
+    """
+    safe_id = re.sub(r'[^A-Za-z0-9_-]', '', notice_id)
+    suffix = '' if lang == 'hi' else f"_{re.sub(r'[^A-Za-z-]', '', lang)}"
+    return f"notice_{timestamp}_{safe_id}{suffix}.mp3"
+
+def synthesize_notice_audio(notice):
+    """
+    Pipeline stage: generate the notice audio file
+    """
+    audio_filename = notice_audio_filename(notice['id'], notice['time'])
+    audio_path = os.path.join(app.config['UPLOAD_FOLDER'], audio_filename)
+    tts_cache.materialize(notice['text'], audio_path, lang='hi')
+    audio_catalog.record(audio_filename, notice_id=notice['id'], kind='notice')
+    notice['audio'] = audio_filename
+    return render_notice(notice)
+
+def persist_notices(notices):
+    """
+    Pipeline stage: append a batch of notices to the notice log with one write
+    """
+    notice_store.append_many(notices)
+    logging.info(f"Stored {len(notices)} new notices")
+    return notices
+
+def broadcast_notice(notice):
+    """
+    Send a single notice as a voice note to the farmers it is routed to
+    """
+    count = broadcast_engine.submit_all(
+        send_notice_voice_note,
+        (
+            (
+                farmer["phone"],
+                notice,
+                "नई कृषि सूचना वॉइस नोट",  # "New agriculture information voice note" in Hindi
+                farmer["language"]
+            )
+            for farmer in farmers_for_notice(notice)
+        )
+    )
+    logging.info(f"Queued notice {notice['id']} for {count} farmers")
+    return notice
+
 def scrape_notices():
     """
     Scrape notices from agriwelfare.gov.in and send audio to registered farmers
     """
     logging.info("Scraping notices from agriwelfare.gov.in...")
     try:
-        # Get last scraped notice ID
+        # Get last scraped notice ID and the feed validators from the previous run
         with open(app.config['LAST_SCRAPE_FILE'], 'r') as f:
             last_scrape_data = json.load(f)
             last_notice_id = last_scrape_data.get("last_notice_id", "")
         
-        # Fetch webpage
-        url = "https://agriwelfare.gov.in/en/Recent"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            logging.error(f"Failed to fetch website: {response.status_code}")
-            return
-        
-        # Fetch notices via AJAX
-        ajax_url = "https://agriwelfare.gov.in/en/getRecent?vacancy_type=Y"
-        ajax_response = requests.post(ajax_url, headers=headers)
+        # Fetch notices via AJAX (short-circuits when the feed is unchanged)
+        notices, feed_state = fetch_feed(last_scrape_data, url=app.config['NOTICES_FEED_URL'])
         
-        if ajax_response.status_code != 200:
-            logging.error(f"Failed to fetch notices via AJAX: {ajax_response.status_code}")
+        if notices is None:
+            if feed_state != last_scrape_data:
+                with open(app.config['LAST_SCRAPE_FILE'], 'w') as f:
+                    json.dump(feed_state, f)
             return
         
-        try:
-            notices_data = ajax_response.json()
-            if 'data' not in notices_data:
-                logging.error("No data found in AJAX response")
-                logging.debug(f"Response content: {ajax_response.text[:500]}")
-                return
-                
-            notices = notices_data['data']
-            logging.info(f"Found {len(notices)} notices via AJAX")
-            
-            new_notices = []
-            newest_notice_id = last_notice_id
+        logging.info(f"Found {len(notices)} notices via AJAX")
+        
+        # Collect feed items newer than the last scraped notice (the feed is newest first)
+        new_items = []
+        newest_notice_id = last_notice_id
+        for item in notices:
+            notice_id = notice_id_for(item)
+            if notice_id == last_notice_id:
+                break
             
-            # Process notices
-            for notice in notices:
-                notice_id = str(notice.get('Id', '')) or str(hash(notice.get('Title', '')))
-                if notice_id == last_notice_id:
-                    break
+            if not item.get('Title'):
+                continue
                 
-                notice_text = notice.get('Title', '')
-                if not notice_text:
-                    continue
-                    
-                if newest_notice_id == last_notice_id:
-                    newest_notice_id = notice_id
-                    
-                new_notices.append({
-                    'id': notice_id,
-                    'text': notice_text,
-                    'publish_date': notice.get('PublishDate', ''),
-                    'file_path': notice.get('FilePath', '')
-                })
+            if newest_notice_id == last_notice_id:
+                newest_notice_id = notice_id
             
-            # Process new notices
-            for notice in reversed(new_notices):
-                notice_text = f"{notice['text']} - Published on {notice['publish_date']}"
-                
-                # Generate audio
-                tts = gTTS(text=notice_text, lang='hi')
-                timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-                audio_filename = f'notice_{timestamp}.mp3'
-                audio_path = os.path.join(app.config['UPLOAD_FOLDER'], audio_filename)
-                tts.save(audio_path)
-                
-                # Add to notices.json
-                with open(app.config['NOTICES_FILE'], 'r+') as f:
-                    notices = json.load(f)
-                    notices.append({
-                        'text': notice_text,
-                        'audio': audio_filename,
-                        'time': timestamp,
-                        'source': 'agriwelfare.gov.in',
-                        'original_link': notice['file_path']
-                    })
-                    f.seek(0)
-                    json.dump(notices, f)
-                    f.truncate()
+            new_items.append(item)
+        
+        if not new_items:
+            logging.info("No new notices found")
+        else:
+            # Stream new notices (oldest first) through concurrent stages, so the first
+            # notice reaches farmers while later ones are still being synthesized
+            pipeline = Pipeline([
+                Stage('dedupe', dedupe_scraped_notice),
+                Stage('synthesize', synthesize_notice_audio, workers=app.config['SCRAPER_TTS_WORKERS']),
+                Stage('persist', persist_notices, batch_size=app.config['SCRAPER_PERSIST_BATCH']),
+                Stage('dispatch', broadcast_notice)
+            ], name='scraper').run(reversed(new_items))
             
-            # Update last scraped notice ID
-            if new_notices and newest_notice_id != last_notice_id:
-                with open(app.config['LAST_SCRAPE_FILE'], 'w') as f:
-                    json.dump({"last_notice_id": newest_notice_id}, f)
-                logging.info(f"Added {len(new_notices)} new notices")
-                
-                # Send voice notes to all farmers with the new notices
-                threading.Thread(target=send_voice_notices_to_all_farmers, daemon=True).start()
-            else:
-                logging.info("No new notices found")
-                
-        except ValueError as e:
-            logging.error(f"Failed to parse AJAX response as JSON: {e}")
-            logging.debug(f"Response content: {ajax_response.text[:500]}")
+            if pipeline.errors:
+                # Keep the previous state so the failed notices are retried on the next run
+                logging.error(f"Scrape finished with {pipeline.errors} errors: {pipeline.stats()}")
+                return
+            
+            logging.info(f"Processed {len(new_items)} new notices: {pipeline.stats()}")
+        
+        # Save the last scraped notice ID and feed validators only after processing succeeded
+        feed_state['last_notice_id'] = newest_notice_id
+        with open(app.config['LAST_SCRAPE_FILE'], 'w') as f:
+            json.dump(feed_state, f)
             
     except Exception as e:
         logging.error(f"Error scraping notices: {e}")
 
-def schedule_scraper():
-    """
-    Run the scraper every 6 hours
-    """
-    schedule.every(6).hours.do(scrape_notices)
-    logging.info("Scheduler started")
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+# Sends run on an asyncio engine with pooled connections when aiohttp is available
+async_dispatcher = None
+if app.config['ASYNC_DISPATCH'] and aiohttp is not None and client:
+    async_dispatcher = AsyncDispatcher(
+        account_sid,
+        auth_token,
+        whatsapp_number,
+        rate_limiter=twilio_rate_limiter,
+        max_in_flight=app.config['DISPATCH_MAX_IN_FLIGHT'],
+        base_url=app.config['TWILIO_API_BASE_URL']
+    )
+
+def record_delivery_sent(row, sid):
+    if row['idempotency_key']:
+        delivery_ledger.mark_sent(row['idempotency_key'], sid)
+
+def record_delivery_failed(row, error):
+    if row['idempotency_key']:
+        delivery_ledger.mark_failed(row['idempotency_key'], error)
+
+# Outbound messages are persisted and delivered (with retries) by the outbox workers
+outbox = Outbox(
+    db,
+    deliver_whatsapp_message,
+    workers=app.config['OUTBOX_WORKERS'],
+    max_attempts=app.config['OUTBOX_MAX_ATTEMPTS'],
+    submit_fn=async_dispatcher.submit if async_dispatcher else None,
+    max_in_flight=app.config['DISPATCH_MAX_IN_FLIGHT'],
+    on_sent=record_delivery_sent,
+    on_failed=record_delivery_failed,
+    rate_limiter=twilio_rate_limiter,
+    max_backlog=app.config['OUTBOX_MAX_BACKLOG'],
+    retention=app.config['OUTBOX_RETENTION_DAYS'] * 86400
+)
 
-# Schedule automatic sending of audio files every day
-def schedule_audio_sender():
+# Slow admin actions (synthesis, broadcast fan-out) run as durable background jobs
+job_queue = JobQueue(db, workers=app.config['JOB_WORKERS'])
+
+def generate_notice_job(job_id, params):
     """
-    Run the audio sender every day at 9 AM
+    Background job for /generate: synthesize, store and broadcast a manual notice
     """
-    schedule.every().day.at("09:00").do(send_recent_audio_to_all_farmers)
-    logging.info("Audio sender scheduler started")
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    notice_text = params['text']
+    timestamp = params['timestamp']
+    notice_id = make_notice_id(notice_text, timestamp)
+    audio_filename = notice_audio_filename(notice_id, timestamp)
 
-# Start background threads
-scraper_thread = threading.Thread(target=schedule_scraper, daemon=True)
-scraper_thread.start()
+    with job_queue.stage(job_id, 'synthesize') as info:
+        audio_path = os.path.join(app.config['UPLOAD_FOLDER'], audio_filename)
+        tts_cache.materialize(notice_text, audio_path, lang='hi')
+        audio_catalog.record(audio_filename, notice_id=notice_id, kind='notice')
+        notice = render_notice(tag_notice({
+            'id': notice_id,
+            'text': notice_text,
+            'audio': audio_filename,
+            'time': timestamp,
+            'source': 'manual'
+        }))
+        info['languages'] = sorted(notice['renders'])
 
-audio_sender_thread = threading.Thread(target=schedule_audio_sender, daemon=True)
-audio_sender_thread.start()
+    with job_queue.stage(job_id, 'persist'):
+        # A job retried after a crash must not store the notice twice
+        if not notice_store.contains(notice_id):
+            notice_store.append(notice)
 
-@app.before_first_request
-def initial_tasks():
-    # Start initial scrape
-    threading.Thread(target=scrape_notices, daemon=True).start()
-    
-    # Send recent audio files to all farmers on startup
-    threading.Thread(target=send_recent_audio_to_all_farmers, daemon=True).start()
+    # Send to the farmers the notice is routed to as voice notes in their language
+    with job_queue.stage(job_id, 'dispatch') as info:
+        info['farmers'] = broadcast_engine.submit_all(
+            send_notice_voice_note,
+            (
+                (
+                    farmer["phone"],
+                    notice,
+                    "नई कृषि सूचना वॉइस नोट",  # "New agriculture information voice note" in Hindi
+                    farmer["language"],
+                    job_id,
+                    'manual'
+                )
+                for farmer in farmers_for_notice(notice)
+            )
+        )
+
+    return {'notice_id': notice_id, 'audio': audio_filename, 'tags': notice['tags']}
+
+job_queue.register('generate', generate_notice_job)
+
+# Roster-wide broadcasts are persisted runs that checkpoint per batch and resume after a restart
+broadcast_runs = BroadcastRuns(db, farmer_store, broadcast_engine, batch_size=app.config['BROADCAST_BATCH_SIZE'])
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    languages = [(lang, LANGUAGE_NAMES.get(lang, lang)) for lang in app.config['NOTICE_LANGUAGES']]
+    return render_template('index.html', languages=languages)
 
 @app.route('/register', methods=['POST'])
 def register():
     name = request.form['name']
     phone = request.form['phone'].replace(' ', '')  # Remove spaces
-    district = request.form['district']
+    district = normalize_district(request.form['district'])
+    language = farmer_language(request.form.get('language'))
     
     # Normalize phone number to +91 format
     if not phone.startswith('+91'):
@@ -406,80 +747,84 @@ def register():
             phone = '+91' + phone.lstrip('+')
     
     # Validate Indian phone number
-    if not re.match(r'^\\+91[6-9]\\d{9}$', phone):
+    if not re.match(r'^\+91[6-9]\d{9}$', phone):
         logging.warning(f"Invalid phone number: {phone}")
         return redirect(url_for('index'))
     
-    # Check for duplicates
-    with open(app.config['FARMERS_FILE'], 'r') as f:
-        farmers = json.load(f)
-        if any(farmer['phone'] == phone for farmer in farmers):
-            logging.warning(f"Phone number already registered: {phone}")
-            return redirect(url_for('index'))
-    
-    # Register new farmer
-    with open(app.config['FARMERS_FILE'], 'r+') as f:
-        farmers = json.load(f)
-        farmers.append({'name': name, 'phone': phone, 'district': district})
-        f.seek(0)
-        json.dump(farmers, f)
-        f.truncate()
+    # Register new farmer (the unique phone index rejects duplicates)
+    if not farmer_store.add(name, phone, district, language):
+        logging.warning(f"Phone number already registered: {phone}")
+        return redirect(url_for('index'))
     logging.info(f"Registered new farmer: {name}, {phone}")
     
     # Send the latest 3 notices to the newly registered farmer as voice notes
-    threading.Thread(target=send_latest_notices_to_farmer, args=(phone, name), daemon=True).start()
+    threading.Thread(target=send_latest_notices_to_farmer, args=(phone, name, district, language, 'interactive'), daemon=True).start()
     
     return redirect(url_for('index'))
 
 @app.route('/generate', methods=['POST'])
 def generate():
-    notice_text = request.form['notice']
-    tts = gTTS(text=notice_text, lang='hi')
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    audio_filename = f'notice_{timestamp}.mp3'
-    audio_path = os.path.join(app.config['UPLOAD_FOLDER'], audio_filename)
-    tts.save(audio_path)
+    """
+    Queue a new notice for synthesis and broadcast; returns 202 with the job id
+    """
+    notice_text = request.form['notice'].strip()
+    if not notice_text:
+        return {'error': 'Notice text is required'}, 400
 
-    with open(app.config['NOTICES_FILE'], 'r+') as f:
-        notices = json.load(f)
-        notices.append({
-            'text': notice_text,
-            'audio': audio_filename,
-            'time': timestamp,
-            'source': 'manual'
-        })
-        f.seek(0)
-        json.dump(notices, f)
-        f.truncate()
-
-    # Send to farmers as voice notes
-    with open(app.config['FARMERS_FILE'], 'r') as f:
-        farmers = json.load(f)
-        for farmer in farmers:
-            threading.Thread(
-                target=send_whatsapp_voice_note,
-                args=(
-                    farmer["phone"],
-                    notice_text,
-                    "नई कृषि सूचना वॉइस नोट"  # "New agriculture information voice note" in Hindi
-                ),
-                daemon=True
-            ).start()
+    job_id = job_queue.submit('generate', {
+        'text': notice_text,
+        'timestamp': datetime.now().strftime('%Y%m%d%H%M%S')
+    })
+    status_url = url_for('job_status', job_id=job_id)
+    return {'job_id': job_id, 'status_url': status_url}, 202, {'Location': status_url}
 
-    return redirect(url_for('index'))
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Report a background job's stages and its per-farmer message counts
+    """
+    job = job_queue.get(job_id)
+    if not job:
+        return {'error': 'Job not found'}, 404
+    job['messages'] = outbox.job_stats(job_id)
+    return job
+
+@lru_cache(maxsize=128)
+def render_archive_notices(before, limit, state_token):
+    """
+    Render one page of the archive list. state_token changes on every notice
+    write, so cached fragments for older states are simply never hit again.
+    """
+    notices, next_cursor = notice_store.page(before=before, limit=limit)
+    return render_template('archive_notices.html', notices=notices, next_cursor=next_cursor, limit=limit)
 
 @app.route('/archive')
 def archive():
-    with open(app.config['NOTICES_FILE'], 'r') as f:
-        notices = json.load(f)
-    return render_template('archive.html', notices=notices)
+    before = request.args.get('before') or None
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    
+    # Answer revalidation with 304 before doing any rendering
+    state_token = notice_store.state_token()
+    etag = hashlib.sha1(f'{state_token}|{before}|{limit}'.encode('utf-8')).hexdigest()
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
+    notices_html = render_archive_notices(before, limit, state_token)
+    response = make_response(render_template('archive.html', notices_html=notices_html))
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(notice_store.last_modified(), tz=timezone.utc)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @app.route('/scrape-now')
 def scrape_now():
     """
     Manually trigger the scraper
     """
-    threading.Thread(target=scrape_notices, daemon=True).start()
+    if not scheduler.run_now('scrape_notices'):
+        logging.info("Scrape requested while one is already running")
     return redirect(url_for('index'))
 
 @app.route('/send-latest-notices/<phone>')
@@ -487,12 +832,10 @@ def send_latest_notices(phone):
     """
     Manually send the latest 3 notices to a specific farmer
     """
-    with open(app.config['FARMERS_FILE'], 'r') as f:
-        farmers = json.load(f)
-        farmer = next((f for f in farmers if f['phone'] == phone), None)
+    farmer = farmer_store.get(phone)
     
     if farmer:
-        threading.Thread(target=send_latest_notices_to_farmer, args=(phone, farmer['name']), daemon=True).start()
+        threading.Thread(target=send_latest_notices_to_farmer, args=(phone, farmer['name'], farmer['district'], farmer['language'], 'manual'), daemon=True).start()
         return "Sending latest notices to farmer..."
     else:
         return "Farmer not found"
@@ -503,7 +846,7 @@ def send_voice_notices_to_all():
     Manually send voice notes of the latest 3 notices to all farmers
     """
     logging.info("Manual trigger: Sending voice notices to all farmers")
-    threading.Thread(target=send_voice_notices_to_all_farmers, daemon=True).start()
+    threading.Thread(target=send_voice_notices_to_all_farmers, args=('manual',), daemon=True).start()
     return "Sending voice notices to all farmers..."
 
 @app.route('/direct-send-audio/<phone>')
@@ -514,84 +857,67 @@ def direct_send_audio(phone):
     logging.info(f"Direct audio test to phone: {phone}")
     
     # Get 3 most recent audio files
-    audio_files = []
-    for file in os.listdir(app.config['UPLOAD_FOLDER']):
-        if file.endswith('.mp3'):
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], file)
-            audio_files.append({
-                'filename': file,
-                'path': file_path,
-                'created': os.path.getctime(file_path)
-            })
-    
-    audio_files.sort(key=lambda x: x['created'], reverse=True)
-    recent_files = audio_files[:3]
+    recent_files = get_recent_audio_files(3)
     
     if not recent_files:
         return "No audio files found"
     
     # Send test message
-    send_whatsapp_message(phone, "Test audio message")
+    send_whatsapp_message(phone, "Test audio message", lane='manual')
     
     # Send each audio file
     for i, audio in enumerate(recent_files):
         media_url = f"{ngrok_audio_url}/{audio['filename']}"
         message = f"Test audio file {i+1}/3"
-        result = send_whatsapp_message(phone, message, media_url)
+        result = send_whatsapp_message(phone, message, media_url, lane='manual')
         logging.info(f"Sent audio file {i+1} to {phone}: {result}")
-        time.sleep(3)
     
     return f"Sent {len(recent_files)} audio files to {phone}"
 
-def broadcast_latest_notices():
+def broadcast_latest_notices(lane='bulk'):
     """
     Sends the latest 3 voice notices to every farmer in the database.
+    Returns the id of the resumable broadcast run.
     """
-    with open(app.config['FARMERS_FILE'], 'r') as f:
-        farmers = json.load(f)
+    return broadcast_runs.start('latest_notices', {'lane': lane})
 
-    for farmer in farmers:
-        phone = farmer.get("phone")
-        name = farmer.get("name", "किसान मित्र")
-        logging.info(f"Sending top 3 notices to {name} at {phone}")
-        send_latest_notices_to_farmer(phone, name)
+def latest_notices_run(farmer, params):
+    """
+    Broadcast run handler: send the latest notices to one farmer
+    """
+    return send_latest_notices_to_farmer(
+        farmer['phone'], farmer['name'] or "किसान मित्र", farmer['district'], farmer['language'], params['lane']
+    )
+
+broadcast_runs.register('latest_notices', latest_notices_run)
 
 @app.route('/send-top-notices-all')
 def send_top_notices_all():
-    threading.Thread(target=broadcast_latest_notices, daemon=True).start()
-    return "Started sending top 3 notices to all farmers."
+    run_id = broadcast_latest_notices('manual')
+    return f"Started sending top 3 notices to all farmers (broadcast {run_id})."
 
 @app.route('/send-recent-audio-files')
 def send_recent_audio_files():
     """
     Send the 3 most recent audio files directly to all farmers
     """
-    threading.Thread(target=send_recent_audio_to_all_farmers, daemon=True).start()
-    return "Started sending recent audio files to all farmers."
+    run_id = send_recent_audio_to_all_farmers('manual')
+    if not run_id:
+        return "No audio files or farmers to send to."
+    return f"Started sending recent audio files to all farmers (broadcast {run_id})."
 
-def send_recent_audio_to_all_farmers():
+def send_recent_audio_to_all_farmers(lane='bulk'):
     """
-    Sends the 3 most recent audio files in static/audio to all farmers
+    Sends the 3 most recent audio files in static/audio to all farmers.
+    The file list and URL are fixed when the run starts, so a resumed run
+    sends the remaining farmers the same files. Bulk runs (the daily send)
+    spread farmers over the delivery window. Returns the run id.
     """
     try:
         logging.info("Starting to send recent audio files to all farmers")
         
-        # Get all audio files from static/audio directory
-        audio_files = []
-        for file in os.listdir(app.config['UPLOAD_FOLDER']):
-            if file.endswith('.mp3'):
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], file)
-                audio_files.append({
-                    'filename': file,
-                    'path': file_path,
-                    'created': os.path.getctime(file_path)
-                })
-        
-        # Sort by creation time (newest first)
-        audio_files.sort(key=lambda x: x['created'], reverse=True)
-        
-        # Get the 3 most recent files
-        recent_files = audio_files[:3]
+        # Get the 3 most recent files from the audio catalog
+        recent_files = get_recent_audio_files(3)
         
         if not recent_files:
             logging.warning("No audio files found to send")
@@ -599,15 +925,14 @@ def send_recent_audio_to_all_farmers():
         
         logging.info(f"Found {len(recent_files)} recent audio files to send")
         
-        # Get all farmers
-        with open(app.config['FARMERS_FILE'], 'r') as f:
-            farmers = json.load(f)
+        # Count registered farmers
+        farmer_count = farmer_store.count()
         
-        if not farmers:
+        if not farmer_count:
             logging.warning("No farmers registered to send audio files to")
             return
         
-        logging.info(f"Sending audio files to {len(farmers)} farmers")
+        logging.info(f"Sending audio files to {farmer_count} farmers")
         
         # Create direct URL to the audio files using the public URL
         public_url = request.url_root.rstrip('/') if request else "http://localhost:5000"
@@ -615,51 +940,89 @@ def send_recent_audio_to_all_farmers():
             # If not using ngrok URL in the request, use the configured one
             public_url = ngrok_audio_url.rsplit('/', 1)[0]
         
-        # Send audio files to each farmer
-        for farmer in farmers:
-            phone = farmer.get("phone")
-            name = farmer.get("name", "किसान मित्र")
-            
-            logging.info(f"Sending audio files to {name} at {phone}")
-            
-            # Send welcome message
-            welcome_message = f"नमस्ते {name}! यहां आपके लिए नवीनतम कृषि ऑडियो फ़ाइलें हैं:"
-            send_result = send_whatsapp_message(phone, welcome_message)
-            
-            if not send_result:
-                logging.error(f"Failed to send welcome message to {phone}, skipping this farmer")
-                continue
-            
-            # Send each audio file
-            for i, audio in enumerate(recent_files):
-                # Create full URL for the audio file
-                media_url = f"{public_url}/audio/{audio['filename']}"
-                logging.info(f"Sending audio file: {media_url}")
-                
-                message = f"ऑडियो फ़ाइल {i+1}/3"
-                result = send_whatsapp_message(phone, message, media_url)
-                if result:
-                    logging.info(f"Successfully sent audio file {i+1} to {phone}")
-                else:
-                    logging.error(f"Failed to send audio file {i+1} to {phone}")
-                time.sleep(3)  # Increased delay between messages
-            
-            logging.info(f"Sent {len(recent_files)} audio files to {name} at {phone}")
-            time.sleep(2)  # Increased delay between farmers
+        # Notice audio files are only sent to the farmers their notice is routed to
+        for audio in recent_files:
+            audio['notice'] = notice_store.get(audio['notice_id']) if audio.get('notice_id') else None
         
-        logging.info(f"Finished sending audio files to {len(farmers)} farmers")
+        # Send audio files to each farmer as a resumable broadcast run
+        return broadcast_runs.start('recent_audio', {
+            'recent_files': recent_files,
+            'public_url': public_url,
+            'lane': lane,
+            'window': delivery_window.bounds() if lane == 'bulk' else None
+        })
     except Exception as e:
         logging.error(f"Error sending audio files: {e}")
         import traceback
         logging.error(traceback.format_exc())
 
+def audio_item_id(audio):
+    """
+    Ledger item id for a catalog audio file: a notice's audio is the notice
+    itself, so a farmer who got it as a voice note is not sent it again
+    """
+    return f"notice:{audio['notice_id']}" if audio.get('notice_id') else f"audio:{audio['filename']}"
+
+def recent_audio_run(farmer, params):
+    """
+    Broadcast run handler: send the run's audio files to one farmer
+    """
+    send_at = delivery_window.slot(farmer['phone'], params['window']) if params.get('window') else None
+    return send_audio_files_to_farmer(
+        farmer['phone'], farmer['name'] or "किसान मित्र", params['recent_files'],
+        params['public_url'], farmer['district'], params['lane'], send_at
+    )
+
+broadcast_runs.register('recent_audio', recent_audio_run)
+
+def send_audio_files_to_farmer(phone, name, recent_files, public_url, district=None, lane='bulk', send_at=None):
+    """
+    Send a welcome message followed by each of the given audio files to one farmer,
+    skipping files the farmer has already received or whose notice targets other districts.
+    send_at is the farmer's slot in the delivery window, if any.
+    Returns False if the farmer could not be sent anything.
+    """
+    if district is not None:
+        recent_files = [
+            audio for audio in recent_files
+            if not audio.get('notice') or notice_targets_district(audio['notice'], district)
+        ]
+    
+    recent_files = [audio for audio in recent_files if not delivery_ledger.has(phone, audio_item_id(audio))]
+    if not recent_files:
+        logging.info(f"{phone} already has the recent audio files")
+        return True
+    
+    logging.info(f"Sending audio files to {name} at {phone}")
+    
+    # Send welcome message
+    welcome_message = f"नमस्ते {name}! यहां आपके लिए नवीनतम कृषि ऑडियो फ़ाइलें हैं:"
+    send_result = send_whatsapp_message(phone, welcome_message, lane=lane, send_at=send_at)
+    
+    if not send_result:
+        logging.error(f"Failed to send welcome message to {phone}, skipping this farmer")
+        return False
+    
+    # Send each audio file
+    for i, audio in enumerate(recent_files):
+        # Create full URL for the audio file
+        media_url = f"{public_url}/audio/{audio['filename']}"
+        logging.info(f"Sending audio file: {media_url}")
+        
+        message = f"ऑडियो फ़ाइल {i+1}/3"
+        result = send_whatsapp_message(phone, message, media_url, item_id=audio_item_id(audio), lane=lane, send_at=send_at)
+        if result:
+            logging.info(f"Successfully sent audio file {i+1} to {phone}")
+        else:
+            logging.error(f"Failed to send audio file {i+1} to {phone}")
+    
+    logging.info(f"Sent {len(recent_files)} audio files to {name} at {phone}")
+    return True
+
 @app.route('/audio')
 def audio_index():
-    """List all available audio files"""
-    files = []
-    for file in os.listdir(app.config['UPLOAD_FOLDER']):
-        if file.endswith('.mp3'):
-            files.append(file)
+    """List the most recent audio files"""
+    files = [audio['filename'] for audio in get_recent_audio_files(200)]
     
     files_html = "<br>".join([f'<a href="/audio/{file}">{file}</a>' for file in files])
     return f"""
@@ -675,16 +1038,81 @@ def audio_index():
 
 @app.route('/audio/<filename>')
 def send_audio(filename):
-    """Serve a specific audio file"""
-    return send_file(os.path.join(app.config['UPLOAD_FOLDER'], filename), mimetype="audio/mpeg")
+    """
+    Serve a specific audio file. Generated audio never changes once written,
+    so it is sent with a strong ETag, a long-lived immutable Cache-Control and
+    HTTP Range support. send_from_directory rejects paths outside the audio
+    folder, and the file body goes through the server's wsgi.file_wrapper
+    (sendfile) or X-Sendfile when enabled.
+    """
+    response = send_from_directory(
+        os.path.abspath(app.config['UPLOAD_FOLDER']),
+        filename,
+        mimetype="audio/mpeg",
+        conditional=True,
+        etag=True,
+        max_age=app.config['AUDIO_MAX_AGE']
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+@app.route('/outbox')
+def outbox_status():
+    """Report outbound message counts by status"""
+    return outbox.stats()
+
+@app.route('/scheduler')
+def scheduler_status():
+    """Report the scheduler lease and each job's spec, next run, last run, duration and outcome"""
+    return {'leader': scheduler_lease.status(), 'jobs': scheduler.status()}
+
+@app.route('/deliveries')
+def deliveries():
+    """Report per-farmer deliveries by status, and how many repeat sends were skipped"""
+    return {**delivery_ledger.stats(), 'digests': digest_builder.stats()}
+
+@app.route('/outbox/lanes')
+def outbox_lanes():
+    """Report queue depth and send latency for each outbox priority lane"""
+    return outbox.lane_stats()
+
+@app.route('/broadcasts')
+def broadcasts():
+    """List recent broadcast runs with their progress"""
+    return {'runs': broadcast_runs.recent()}
+
+@app.route('/broadcasts/<run_id>')
+def broadcast_status(run_id):
+    """Report a broadcast run's progress, ETA and recent failed recipients"""
+    run = broadcast_runs.get(run_id)
+    if not run:
+        return {'error': 'Broadcast not found'}, 404
+    return run
+
+@app.route('/broadcasts/<run_id>/<action>')
+def broadcast_control(run_id, action):
+    """Pause, resume or cancel a broadcast run"""
+    controls = {'pause': broadcast_runs.pause, 'resume': broadcast_runs.resume, 'cancel': broadcast_runs.cancel}
+    if action not in controls:
+        return {'error': f'Unknown action {action}'}, 404
+    if not controls[action](run_id):
+        return {'error': f'Broadcast cannot {action} from its current state'}, 409
+    return broadcast_runs.get(run_id)
+
+@app.route('/tts-stats')
+def tts_stats():
+    """Report TTS cache hit rate and synthesis latency"""
+    return tts_cache.stats()
 
 @app.route('/test-message')
 def test_message():
     # Use a placeholder phone number
-    test_phone = os.environ.get('TEST_PHONE', '+917739006104')  # Using a real number from farmers.json
-    result = send_whatsapp_message(test_phone, 'यह एक परीक्षण संदेश है')
+    test_phone = os.environ.get('TEST_PHONE', '+917739006104')  # Using a real number from the farmer store
+    result = send_whatsapp_message(test_phone, 'यह एक परीक्षण संदेश है', lane='manual')
     if result:
-        return 'Sent test message successfully'
+        return 'Queued test message successfully'
     else:
         return 'Failed to send test message, check logs'
 
@@ -694,21 +1122,11 @@ def test_audio_send():
     phone = request.form.get('phone', '+917739006104')
     
     # Get the most recent audio file
-    audio_files = []
-    for file in os.listdir(app.config['UPLOAD_FOLDER']):
-        if file.endswith('.mp3'):
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], file)
-            audio_files.append({
-                'filename': file,
-                'path': file_path,
-                'created': os.path.getctime(file_path)
-            })
+    audio_files = get_recent_audio_files(1)
     
     if not audio_files:
         return "No audio files found to send"
     
-    # Sort by creation time (newest first)
-    audio_files.sort(key=lambda x: x['created'], reverse=True)
     audio = audio_files[0]
     
     # Create direct URL to the audio file
@@ -721,7 +1139,7 @@ def test_audio_send():
     logging.info(f"Testing with media URL: {media_url}")
     
     # Send the audio file
-    result = send_whatsapp_message(phone, f"Test audio file: {audio['filename']}", media_url)
+    result = send_whatsapp_message(phone, f"Test audio file: {audio['filename']}", media_url, lane='manual')
     
     if result:
         return f"""
@@ -739,6 +1157,37 @@ def test_audio_send():
         <p><a href="/audio">Back to audio list</a></p>
         """
 
+# All periodic work runs on one scheduler thread, started by start_background_services()
+scheduler = Scheduler(app.config['SCHEDULER_STATE_FILE'])
+scheduler.add_job('scrape_notices', scrape_notices, app.config['SCRAPE_SCHEDULE'],
+                  jitter=app.config['SCHEDULE_JITTER'], run_at_start=True)
+# A daily send missed while the app was down is caught up once on start, not repeated on every restart
+# and, as a bulk broadcast, goes out spread over DELIVERY_WINDOW
+scheduler.add_job('send_recent_audio', send_recent_audio_to_all_farmers, app.config['AUDIO_SEND_SCHEDULE'],
+                  jitter=app.config['SCHEDULE_JITTER'])
+
+# Broadcasts left running by a process that died are picked up where they stopped
+scheduler.add_job('resume_broadcasts', broadcast_runs.resume_stale, 'every 1m', run_at_start=True)
+
+# With several workers (e.g. gunicorn), the scheduler runs only in the lease holder
+scheduler_lease = LeaderLease(
+    db,
+    'scheduler',
+    ttl=app.config['LEADER_LEASE_TTL'],
+    on_elected=scheduler.start,
+    on_demoted=scheduler.stop
+)
+
+def start_background_services():
+    """
+    Start the outbox and job workers and join the election for the scheduler.
+    Called explicitly by the process that serves the app (see __main__ and
+    wsgi.py), so importing app.py from scripts or tests starts no threads.
+    """
+    outbox.start()
+    job_queue.start()
+    scheduler_lease.start()
+
 if __name__ == "__main__":
     # Load environment variables
     try:
@@ -757,5 +1206,9 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Error setting up ngrok: {e}")
     
+    # With the debug reloader only the serving child process (not the watcher) runs background work
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+
     # Start the Flask app
     app.run(debug=True)
\ No newline at end of file
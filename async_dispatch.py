@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import threading
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+TWILIO_API_BASE_URL = 'https://api.twilio.com'
+
+
+class TwilioHTTPError(Exception):
+    """
+    Error response from the Twilio Messages API; status mirrors
+    TwilioRestException.status so the outbox can classify it
+    """
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+class AsyncDispatcher:
+    """
+    asyncio engine for Twilio sends.
+
+    Runs an event loop on one background thread with a pooled aiohttp
+    session, so hundreds of messages can be in flight without a thread per
+    request. Every send still takes a token from the shared rate limiter.
+    submit() can be called from any thread and returns a
+    concurrent.futures.Future resolving to the message SID.
+    """
+
+    def __init__(self, account_sid, auth_token, from_number, rate_limiter=None,
+                 max_in_flight=200, base_url=TWILIO_API_BASE_URL, timeout=30):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for the async dispatcher")
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.rate_limiter = rate_limiter
+        self.max_in_flight = max_in_flight
+        self.url = f"{base_url.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.timeout = timeout
+        self._loop = None
+        self._session = None
+        self._semaphore = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run_loop, name='async-dispatch', daemon=True)
+            self._thread.start()
+        self._ready.wait()
+        logging.info(f"Async dispatcher started (max {self.max_in_flight} in flight)")
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._open())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _open(self):
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            auth=aiohttp.BasicAuth(self.account_sid, self.auth_token),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def send(self, to_number, body, media_url=None):
+        """
+        Create one message through the Messages API and return its SID
+        """
+        data = {'From': self.from_number, 'To': to_number, 'Body': body or ''}
+        if media_url:
+            data['MediaUrl'] = media_url
+
+        async with self._semaphore:
+            if self.rate_limiter:
+                wait = self.rate_limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            async with self._session.post(self.url, data=data) as response:
+                payload = await response.json(content_type=None)
+                if response.status >= 400:
+                    message = payload.get('message', '') if isinstance(payload, dict) else ''
+                    raise TwilioHTTPError(response.status, message)
+                return payload['sid']
+
+    def submit(self, to_number, body, media_url=None):
+        """
+        Schedule a send from any thread; returns a concurrent.futures.Future
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.send(to_number, body, media_url), self._loop)
+
+    def close(self):
+        if not self._loop:
+            return
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,107 @@
+import os
+import time
+import logging
+
+import mp3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audio_assets (
+    filename TEXT PRIMARY KEY,
+    notice_id TEXT,
+    kind TEXT NOT NULL DEFAULT 'audio',
+    created_at REAL NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS idx_audio_assets_created ON audio_assets (created_at);
+CREATE INDEX IF NOT EXISTS idx_audio_assets_notice ON audio_assets (notice_id);
+"""
+
+
+class AudioCatalog:
+    """
+    Catalog of generated audio files in the audio folder.
+    Entries are recorded when audio is written, so "most recent K" is an
+    index lookup rather than a directory scan with a stat per file.
+    """
+
+    def __init__(self, db, folder):
+        self.db = db
+        self.folder = folder
+        self.db.executescript(SCHEMA)
+
+    @staticmethod
+    def _to_dict(row, folder):
+        return {
+            'filename': row['filename'],
+            'path': os.path.join(folder, row['filename']),
+            'notice_id': row['notice_id'],
+            'kind': row['kind'],
+            'created': row['created_at'],
+            'size': row['size'],
+            'duration': row['duration'],
+        }
+
+    def record(self, filename, notice_id=None, kind='audio', created_at=None):
+        """
+        Add or update the catalog entry for a file that was just written
+        """
+        path = os.path.join(self.folder, filename)
+        try:
+            size = os.path.getsize(path)
+            length = mp3.duration(path)
+        except OSError as e:
+            logging.error(f"Could not catalog audio file {filename}: {e}")
+            return
+        self.db.execute(
+            "INSERT INTO audio_assets (filename, notice_id, kind, created_at, size, duration) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(filename) DO UPDATE SET notice_id = COALESCE(excluded.notice_id, notice_id), "
+            "kind = excluded.kind, size = excluded.size, duration = excluded.duration",
+            (filename, notice_id, kind, created_at or time.time(), size, length)
+        )
+
+    def remove(self, filename):
+        self.db.execute("DELETE FROM audio_assets WHERE filename = ?", (filename,))
+
+    def get(self, filename):
+        row = self.db.execute("SELECT * FROM audio_assets WHERE filename = ?", (filename,)).fetchone()
+        return self._to_dict(row, self.folder) if row else None
+
+    def recent(self, count=3, kind=None):
+        """
+        Return the newest count audio files (optionally of one kind), newest first
+        """
+        if kind:
+            rows = self.db.execute(
+                "SELECT * FROM audio_assets WHERE kind = ? ORDER BY created_at DESC LIMIT ?", (kind, count)
+            ).fetchall()
+        else:
+            rows = self.db.execute(
+                "SELECT * FROM audio_assets ORDER BY created_at DESC LIMIT ?", (count,)
+            ).fetchall()
+        return [self._to_dict(row, self.folder) for row in rows]
+
+    def for_notice(self, notice_id):
+        rows = self.db.execute(
+            "SELECT * FROM audio_assets WHERE notice_id = ? ORDER BY created_at DESC", (notice_id,)
+        ).fetchall()
+        return [self._to_dict(row, self.folder) for row in rows]
+
+    def backfill(self):
+        """
+        Catalog MP3 files already on disk if the catalog is empty (first run)
+        Returns the number of files added.
+        """
+        if self.db.execute("SELECT 1 FROM audio_assets LIMIT 1").fetchone():
+            return 0
+
+        added = 0
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.mp3') and entry.is_file():
+                kind = 'tts' if entry.name.startswith('tts_') else 'notice' if entry.name.startswith('notice_') else 'audio'
+                self.record(entry.name, kind=kind, created_at=entry.stat().st_ctime)
+                added += 1
+        if added:
+            logging.info(f"Cataloged {added} existing audio files")
+        return added
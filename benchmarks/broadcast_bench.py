@@ -0,0 +1,358 @@
+"""
+Offline broadcast throughput benchmark.
+
+Drives the real broadcast code paths (send_voice_notices_to_all_farmers,
+broadcast_latest_notices, send_recent_audio_to_all_farmers and /generate)
+with the fake TTS backend over synthetic rosters, through both outbox
+senders: the default async sender posting to a local Twilio-compatible stub
+(via TWILIO_API_BASE_URL), and the threaded sender with a fake Twilio
+client. Twilio and TTS latency are configurable. Every scenario, sender and
+roster size runs in its own process and scratch directory, and reports
+messages/sec, wall time, peak threads and peak RSS. Results are appended to
+benchmarks/results.jsonl with the git commit they were measured at.
+
+    python benchmarks/broadcast_bench.py
+    python benchmarks/broadcast_bench.py --sizes 1000 --scenarios recent_audio --senders async --twilio-latency 0.05
+"""
+import socket
+import asyncio
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from types import SimpleNamespace
+from datetime import datetime, timezone
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results.jsonl')
+
+SCENARIOS = ['voice_notices', 'latest_notices', 'recent_audio', 'generate']
+SENDERS = ['async', 'threaded']
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+NOTICE_TEXTS = [
+    "गेहूं की बुवाई के लिए बीज पर सब्सिडी - Published on 01/10/2026",
+    "Soybean procurement at MSP opens nationwide - Published on 02/10/2026",
+    "धान की फसल में कीट प्रबंधन पर सलाह - Published on 03/10/2026",
+]
+
+
+class FakeMessages:
+    def __init__(self, latency):
+        self.latency = latency
+        self.created = 0
+        self._lock = threading.Lock()
+
+    def create(self, **params):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.created += 1
+            sid = f'SM{self.created:032x}'
+        return SimpleNamespace(sid=sid)
+
+
+class FakeTwilioClient:
+    """
+    Stands in for twilio.rest.Client: messages.create() sleeps for latency and returns a SID
+    """
+
+    def __init__(self, latency=0.0):
+        self.messages = FakeMessages(latency)
+
+
+class TwilioStub:
+    """
+    Local stand-in for the Twilio Messages API, served by aiohttp on its own
+    thread: every POST .../Messages.json waits latency seconds and returns a SID
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.created = 0
+        self.base_url = None
+        self._loop = None
+        self._runner = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='twilio-stub', daemon=True)
+
+    async def _create(self, request):
+        await request.post()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.created += 1
+        return web.json_response({'sid': f'SM{self.created:032x}', 'status': 'queued'}, status=201)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        stub = web.Application()
+        stub.router.add_post('/2010-04-01/Accounts/{account_sid}/Messages.json', self._create)
+        self._runner = web.AppRunner(stub, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        self._loop.run_until_complete(web.SockSite(self._runner, sock).start())
+        self.base_url = f'http://127.0.0.1:{sock.getsockname()[1]}'
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        return self.base_url
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+class PeakSampler:
+    """
+    Samples the live thread count on a background thread
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='bench-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def seed_roster(app, size):
+    now = time.time()
+    with app.db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO farmers (phone, name, district, language, created_at) VALUES (?, ?, ?, ?, ?)",
+            ((f'+91{7000000000 + i}', f'Farmer {i}', 'Patna', 'hi', now) for i in range(size))
+        )
+
+
+def seed_notices(app):
+    """
+    Ingest notices through the scraper's synthesize and persist stages
+    """
+    notices = []
+    for i, text in enumerate(NOTICE_TEXTS):
+        notice = app.tag_notice({
+            'id': f'bench-{i}',
+            'text': text,
+            'time': f'2026100{i + 1}000000',
+            'source': 'benchmark'
+        })
+        notices.append(app.synthesize_notice_audio(notice))
+    app.persist_notices(notices)
+
+
+def busy(app):
+    """
+    Whether any broadcast run, job or outbox message is still in progress
+    """
+    queries = [
+        "SELECT COUNT(*) FROM broadcast_runs WHERE status = 'running'",
+        "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')",
+        "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')",
+    ]
+    return any(app.db.execute(query).fetchone()[0] for query in queries) or app.broadcast_engine.pending()
+
+
+def trigger(app, scenario):
+    if scenario == 'voice_notices':
+        app.send_voice_notices_to_all_farmers()
+    elif scenario == 'latest_notices':
+        app.broadcast_latest_notices()
+    elif scenario == 'recent_audio':
+        app.send_recent_audio_to_all_farmers()
+    elif scenario == 'generate':
+        response = app.app.test_client().post('/generate', data={'notice': 'बेंचमार्क सूचना: मौसम चेतावनी'})
+        if response.status_code != 202:
+            raise RuntimeError(f"/generate returned {response.status_code}")
+    else:
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def run_scenario(scenario, size, sender, twilio_latency, tts_latency, timeout):
+    """
+    Run one scenario in this process (started by main() in a scratch
+    directory) and print its measurements as JSON
+    """
+    sys.path.insert(0, REPO_DIR)
+    import app
+    from tts_backends import FakeBackend
+
+    # Per-message INFO logging would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if sender == 'threaded':
+        app.client = FakeTwilioClient(twilio_latency)
+    elif app.async_dispatcher is None:
+        raise RuntimeError("The async sender is not configured (is aiohttp installed?)")
+    app.tts_cache.backend = FakeBackend(latency=tts_latency)
+    seed_roster(app, size)
+    seed_notices(app)
+
+    sampler = PeakSampler()
+    sampler.start()
+    app.outbox.start()
+    app.job_queue.start()
+
+    started = time.monotonic()
+    trigger(app, scenario)
+    # Runs and jobs are created before trigger() returns, so idle means finished
+    while busy(app):
+        if time.monotonic() - started > timeout:
+            raise RuntimeError(f"{scenario} with {size} farmers did not finish within {timeout}s")
+        time.sleep(0.05)
+    wall = time.monotonic() - started
+    sampler.stop()
+
+    messages = app.outbox.stats().get('sent', 0)
+    print(json.dumps({
+        'scenario': scenario,
+        'sender': sender,
+        'farmers': size,
+        'messages': messages,
+        'failed': app.outbox.stats().get('failed', 0),
+        'wall_seconds': round(wall, 3),
+        'messages_per_second': round(messages / wall, 1) if wall else None,
+        'peak_threads': sampler.peak_threads,
+        'peak_rss_mb': peak_rss_mb(),
+    }))
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        # Results appended by earlier runs don't make the measured code dirty
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no', '--', '.',
+                                     f':!{os.path.relpath(RESULTS_FILE, REPO_DIR)}'], cwd=REPO_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES, help='roster sizes')
+    parser.add_argument('--senders', nargs='+', choices=SENDERS, default=SENDERS, help='outbox senders to run')
+    parser.add_argument('--twilio-latency', type=float, default=0.01, help='seconds per fake Twilio call')
+    parser.add_argument('--tts-latency', type=float, default=0.2, help='seconds per fake synthesis')
+    parser.add_argument('--rate', type=float, default=1000, help='TWILIO_MESSAGES_PER_SECOND for the run')
+    parser.add_argument('--timeout', type=float, default=3600, help='seconds before a run is abandoned')
+    parser.add_argument('--results', default=RESULTS_FILE, help='JSON lines file results are appended to')
+    parser.add_argument('--no-save', action='store_true', help='print results without appending them')
+    parser.add_argument('--run', nargs=3, metavar=('SCENARIO', 'SIZE', 'SENDER'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_scenario(args.run[0], int(args.run[1]), args.run[2], args.twilio_latency, args.tts_latency, args.timeout)
+        return
+
+    senders = args.senders
+    if 'async' in senders and web is None:
+        print("aiohttp is not installed; skipping the async sender")
+        senders = [sender for sender in senders if sender != 'async']
+    stub = TwilioStub(args.twilio_latency) if 'async' in senders else None
+    base_url = stub.start() if stub else ''
+
+    commit, dirty = git_revision()
+    env = dict(
+        os.environ,
+        TTS_BACKEND='fake',
+        TWILIO_API_BASE_URL=base_url,
+        TWILIO_ACCOUNT_SID='ACbenchmark',
+        TWILIO_AUTH_TOKEN='benchmark',
+        TWILIO_MESSAGES_PER_SECOND=str(args.rate),
+        TWILIO_BURST=str(max(int(args.rate), 1)),
+        DELIVERY_WINDOW='',
+        QUIET_HOURS='',
+        DATABASE_PATH='agrivoice.db',
+    )
+
+    print(f"{'scenario':<16}{'sender':<10}{'farmers':>9}{'messages':>10}{'wall s':>10}{'msg/s':>10}"
+          f"{'threads':>9}{'RSS MB':>9}")
+    try:
+        for size in args.sizes:
+            for scenario in args.scenarios:
+                for sender in senders:
+                    run_env = dict(env, ASYNC_DISPATCH='1' if sender == 'async' else '0')
+                    result = run_subprocess(scenario, size, sender, args, run_env)
+                    if result and not args.no_save:
+                        save_result(result, args, commit, dirty)
+    finally:
+        if stub:
+            stub.stop()
+
+
+def run_subprocess(scenario, size, sender, args, env):
+    workdir = tempfile.mkdtemp(prefix='agrivoice-bench-')
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run', scenario, str(size), sender,
+             '--twilio-latency', str(args.twilio_latency), '--tts-latency', str(args.tts_latency),
+             '--timeout', str(args.timeout)],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if completed.returncode != 0:
+        print(f"{scenario:<16}{sender:<10}{size:>9}  failed:\n{completed.stderr[-2000:]}")
+        return None
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    print(f"{scenario:<16}{sender:<10}{size:>9}{result['messages']:>10}{result['wall_seconds']:>10}"
+          f"{result['messages_per_second']:>10}{result['peak_threads']:>9}{result['peak_rss_mb']:>9}")
+    return result
+
+
+def save_result(result, args, commit, dirty):
+    result.update({
+        'commit': commit,
+        'dirty': dirty,
+        'measured_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'twilio_latency': args.twilio_latency,
+        'tts_latency': args.tts_latency,
+        'rate': args.rate,
+        'python': sys.version.split()[0],
+    })
+    with open(args.results, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
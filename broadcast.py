@@ -0,0 +1,68 @@
+import queue
+import logging
+import threading
+
+
+class BroadcastEngine:
+    """
+    Fixed-size worker pool fed by a bounded queue.
+
+    All broadcast entry points submit per-farmer work here instead of starting
+    a thread per farmer, so thread count and queued memory stay flat no matter
+    how large the roster is. submit() blocks while the queue is full, which
+    throttles producers to the speed of the workers.
+    """
+
+    def __init__(self, workers=8, queue_size=1000, name='broadcast'):
+        self.workers = workers
+        self.name = name
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'{self.name}-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logging.info(f"Broadcast engine started with {self.workers} workers")
+
+    def _worker(self):
+        while True:
+            fn, args, kwargs = self._queue.get()
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                logging.error(f"Broadcast task {getattr(fn, '__name__', fn)} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) for a worker, blocking while the queue is full
+        """
+        self.start()
+        self._queue.put((fn, args, kwargs))
+
+    def submit_all(self, fn, args_iter):
+        """
+        Queue fn(*args) for every args tuple, blocking as needed for backpressure.
+        Returns the number of tasks submitted.
+        """
+        count = 0
+        for args in args_iter:
+            self.submit(fn, *args)
+            count += 1
+        return count
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def join(self):
+        """
+        Block until every queued task has been processed
+        """
+        self._queue.join()
@@ -0,0 +1,290 @@
+import time
+import json
+import uuid
+import logging
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS broadcast_runs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running',
+    cursor INTEGER NOT NULL DEFAULT 0,
+    until_id INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    active_seconds REAL NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_broadcast_runs_status ON broadcast_runs (status, created_at);
+CREATE TABLE IF NOT EXISTS broadcast_recipients (
+    run_id TEXT NOT NULL,
+    farmer_id INTEGER NOT NULL,
+    phone TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, farmer_id)
+);
+"""
+
+
+class BroadcastRuns:
+    """
+    Roster-wide broadcasts as persisted, resumable runs.
+
+    A run walks the farmers registered when it started in id order, batch_size
+    at a time, through the broadcast engine. After each batch it records every
+    recipient's outcome (queued or failed) and advances its cursor to the last
+    farmer id, so a run interrupted by a crash or restart resumes after the
+    last finished batch instead of starting over. Runs can be paused, resumed
+    and cancelled; pausing or cancelling takes effect at the next batch.
+
+    Handlers are registered per kind as fn(farmer, params) and return False
+    (or raise) when the farmer could not be served. A running run whose owner
+    stopped heartbeating for stale_after seconds is taken over by
+    resume_stale().
+    """
+
+    def __init__(self, db, farmer_store, engine, batch_size=100, stale_after=120):
+        self.db = db
+        self.farmer_store = farmer_store
+        self.engine = engine
+        self.batch_size = batch_size
+        self.stale_after = stale_after
+        self.worker_id = uuid.uuid4().hex
+        self.handlers = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+        self.db.executescript(SCHEMA)
+
+    def register(self, kind, fn):
+        self.handlers[kind] = fn
+
+    def start(self, kind, params):
+        """
+        Create a run over every farmer registered now and start driving it; returns the run id
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler for broadcast kind {kind}")
+        run_id = uuid.uuid4().hex
+        until_id = self.farmer_store.max_id()
+        now = time.time()
+        self.db.execute(
+            "INSERT INTO broadcast_runs (id, kind, params, until_id, total, claimed_by, heartbeat_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, kind, json.dumps(params, ensure_ascii=False), until_id,
+             self.farmer_store.count_until(until_id), self.worker_id, now, now, now)
+        )
+        logging.info(f"Started {kind} broadcast {run_id}")
+        self._spawn(run_id)
+        return run_id
+
+    def pause(self, run_id):
+        return self._set_status(run_id, 'paused', ('running',))
+
+    def cancel(self, run_id):
+        return self._set_status(run_id, 'cancelled', ('running', 'paused'))
+
+    def resume(self, run_id):
+        """
+        Continue a paused run from its cursor in this process
+        """
+        now = time.time()
+        cursor = self.db.execute(
+            "UPDATE broadcast_runs SET status = 'running', claimed_by = ?, heartbeat_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'paused'",
+            (self.worker_id, now, now, run_id)
+        )
+        if not cursor.rowcount:
+            return False
+        self._spawn(run_id)
+        return True
+
+    def resume_stale(self):
+        """
+        Take over running runs whose owner stopped heartbeating (e.g. the
+        process died or restarted); returns the number resumed
+        """
+        now = time.time()
+        rows = self.db.execute(
+            "SELECT id FROM broadcast_runs WHERE status = 'running' AND heartbeat_at < ?",
+            (now - self.stale_after,)
+        ).fetchall()
+        resumed = 0
+        for row in rows:
+            cursor = self.db.execute(
+                "UPDATE broadcast_runs SET claimed_by = ?, heartbeat_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND heartbeat_at < ?",
+                (self.worker_id, now, now, row['id'], now - self.stale_after)
+            )
+            if cursor.rowcount:
+                logging.info(f"Resuming broadcast {row['id']}")
+                self._spawn(row['id'])
+                resumed += 1
+        return resumed
+
+    def _set_status(self, run_id, status, allowed):
+        now = time.time()
+        placeholders = ', '.join('?' for _ in allowed)
+        cursor = self.db.execute(
+            f"UPDATE broadcast_runs SET status = ?, updated_at = ?, finished_at = ? "
+            f"WHERE id = ? AND status IN ({placeholders})",
+            (status, now, now if status == 'cancelled' else None, run_id, *allowed)
+        )
+        if cursor.rowcount:
+            logging.info(f"Broadcast {run_id} {status}")
+        return bool(cursor.rowcount)
+
+    def _spawn(self, run_id):
+        with self._lock:
+            if run_id in self._threads:
+                # The driver still running this run picks the new status up at its next batch
+                return
+            thread = threading.Thread(target=self._drive, args=(run_id,), name=f'broadcast-run-{run_id[:8]}', daemon=True)
+            self._threads[run_id] = thread
+        thread.start()
+
+    def _owned(self, run_id):
+        row = self.db.execute(
+            "SELECT status, claimed_by FROM broadcast_runs WHERE id = ?", (run_id,)
+        ).fetchone()
+        return row is not None and row['status'] == 'running' and row['claimed_by'] == self.worker_id
+
+    def _heartbeat(self, run_id):
+        self.db.execute(
+            "UPDATE broadcast_runs SET heartbeat_at = ? WHERE id = ? AND claimed_by = ?",
+            (time.time(), run_id, self.worker_id)
+        )
+
+    def _drive(self, run_id):
+        try:
+            row = self.db.execute("SELECT * FROM broadcast_runs WHERE id = ?", (run_id,)).fetchone()
+            handler = self.handlers[row['kind']]
+            params = json.loads(row['params'])
+            until_id = row['until_id']
+
+            while True:
+                if not self._owned(run_id):
+                    # Re-check under the lock so a resume() racing with this exit is not lost
+                    with self._lock:
+                        if not self._owned(run_id):
+                            self._threads.pop(run_id, None)
+                            return
+
+                row = self.db.execute("SELECT cursor FROM broadcast_runs WHERE id = ?", (run_id,)).fetchone()
+                farmers = self.farmer_store.page(row['cursor'], self.batch_size, until_id)
+                if not farmers:
+                    self._finish(run_id)
+                    return
+
+                started = time.monotonic()
+                outcomes = self._run_batch(run_id, handler, farmers, params)
+                self._checkpoint(run_id, farmers, outcomes, time.monotonic() - started)
+        except Exception as e:
+            logging.error(f"Broadcast {run_id} failed: {e}")
+            now = time.time()
+            self.db.execute(
+                "UPDATE broadcast_runs SET status = 'failed', updated_at = ?, finished_at = ? WHERE id = ? AND claimed_by = ?",
+                (now, now, run_id, self.worker_id)
+            )
+        finally:
+            with self._lock:
+                if self._threads.get(run_id) is threading.current_thread():
+                    self._threads.pop(run_id)
+
+    def _run_batch(self, run_id, handler, farmers, params):
+        """
+        Serve one batch through the engine's workers and wait for all of it
+        """
+        outcomes = {}
+        done = threading.Semaphore(0)
+
+        def serve(farmer):
+            try:
+                ok = handler(farmer, params)
+                outcomes[farmer['id']] = ('queued', None) if ok is not False else ('failed', None)
+            except Exception as e:
+                outcomes[farmer['id']] = ('failed', str(e))
+            finally:
+                done.release()
+
+        for farmer in farmers:
+            self.engine.submit(serve, farmer)
+        for _ in farmers:
+            while not done.acquire(timeout=self.stale_after / 3):
+                self._heartbeat(run_id)
+        return outcomes
+
+    def _checkpoint(self, run_id, farmers, outcomes, seconds):
+        now = time.time()
+        failed = sum(1 for outcome, _ in outcomes.values() if outcome == 'failed')
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO broadcast_recipients (run_id, farmer_id, phone, outcome, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, farmer['id'], farmer['phone'], *outcomes[farmer['id']], now) for farmer in farmers]
+            )
+            conn.execute(
+                "UPDATE broadcast_runs SET cursor = ?, processed = processed + ?, failed = failed + ?, "
+                "active_seconds = active_seconds + ?, heartbeat_at = ?, updated_at = ? WHERE id = ? AND claimed_by = ?",
+                (farmers[-1]['id'], len(farmers), failed, seconds, now, now, run_id, self.worker_id)
+            )
+
+    def _finish(self, run_id):
+        now = time.time()
+        self.db.execute(
+            "UPDATE broadcast_runs SET status = 'done', updated_at = ?, finished_at = ? "
+            "WHERE id = ? AND status = 'running' AND claimed_by = ?",
+            (now, now, run_id, self.worker_id)
+        )
+        logging.info(f"Broadcast {run_id} finished")
+
+    @staticmethod
+    def _to_dict(row):
+        processed, total = row['processed'], row['total']
+        remaining = max(total - processed, 0)
+        rate = processed / row['active_seconds'] if row['active_seconds'] else None
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'total': total,
+            'processed': processed,
+            'failed': row['failed'],
+            'remaining': remaining,
+            'percent': round(100 * processed / total, 1) if total else 100.0,
+            'farmers_per_second': round(rate, 2) if rate else None,
+            'eta_seconds': round(remaining / rate) if rate and row['status'] == 'running' else None,
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'finished_at': row['finished_at'],
+        }
+
+    def get(self, run_id):
+        """
+        Progress of a run, with its ETA and the most recent failed recipients
+        """
+        row = self.db.execute("SELECT * FROM broadcast_runs WHERE id = ?", (run_id,)).fetchone()
+        if not row:
+            return None
+        run = self._to_dict(row)
+        failures = self.db.execute(
+            "SELECT phone, error, updated_at FROM broadcast_recipients WHERE run_id = ? AND outcome = 'failed' "
+            "ORDER BY updated_at DESC LIMIT 20",
+            (run_id,)
+        ).fetchall()
+        run['recent_failures'] = [dict(failure) for failure in failures]
+        return run
+
+    def recent(self, limit=20):
+        rows = self.db.execute(
+            "SELECT * FROM broadcast_runs ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
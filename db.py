@@ -0,0 +1,61 @@
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class Database:
+    """
+    Thin wrapper around an SQLite file that hands each thread its own
+    connection. WAL mode lets the web workers read while background
+    threads write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.conn.execute(sql, params)
+
+    def executescript(self, script):
+        return self.conn.executescript(script)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the block inside a write transaction (BEGIN IMMEDIATE), so
+        read-then-update sequences are atomic across threads and processes
+        """
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def run_once(self, name, fn):
+        """
+        Run fn(conn) the first time a migration called name is seen by this
+        database, recording it so later startups (of any process) skip it
+        """
+        self.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at REAL NOT NULL)")
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+                return False
+            fn(conn)
+            conn.execute("INSERT INTO migrations (name, applied_at) VALUES (?, ?)", (name, time.time()))
+            return True
@@ -0,0 +1,111 @@
+import time
+import hashlib
+from datetime import datetime, timedelta
+
+
+def parse_range(text):
+    """
+    Parse 'HH:MM-HH:MM' into ((hour, minute), (hour, minute)); empty text gives None.
+    A range may cross midnight, e.g. '21:00-07:00'.
+    """
+    if not text or not text.strip():
+        return None
+    start, end = text.split('-')
+    bounds = []
+    for part in (start, end):
+        hour, minute = part.strip().split(':')
+        if not (0 <= int(hour) < 24 and 0 <= int(minute) < 60):
+            raise ValueError(f"Invalid time in range {text!r}")
+        bounds.append((int(hour), int(minute)))
+    if bounds[0] == bounds[1]:
+        raise ValueError(f"Empty time range {text!r}")
+    return tuple(bounds)
+
+
+def _length_minutes(bounds):
+    (start_hour, start_minute), (end_hour, end_minute) = bounds
+    return ((end_hour * 60 + end_minute) - (start_hour * 60 + start_minute)) % (24 * 60)
+
+
+def _occurrences(bounds, moment):
+    """
+    Yield (start, end) datetimes of a daily range, from the one that began yesterday onwards
+    """
+    start_hour, start_minute = bounds[0]
+    length = _length_minutes(bounds)
+    day = moment.replace(hour=start_hour, minute=start_minute, second=0, microsecond=0) - timedelta(days=1)
+    for _ in range(3):
+        yield day, day + timedelta(minutes=length)
+        day += timedelta(days=1)
+
+
+class DeliveryWindow:
+    """
+    Spreads a broadcast over a daily delivery window and keeps bulk messages
+    out of quiet hours.
+
+    Each farmer gets a deterministic slot in the window from a hash of their
+    phone number, so a roster is spread evenly, a farmer hears from us at
+    about the same time every day, and a resumed broadcast gives every
+    farmer the slot they would have had. Messages held through quiet hours
+    are spread the same way over a window as long as the delivery window
+    (an hour without one) starting when quiet hours end. Times are local.
+    """
+
+    def __init__(self, window='09:00-11:00', quiet_hours=''):
+        self.window = parse_range(window)
+        self.quiet_hours = parse_range(quiet_hours)
+        self.spread = _length_minutes(self.window) * 60 if self.window else 3600
+
+    def bounds(self, now=None):
+        """
+        Return (start, end) epoch seconds to spread a broadcast starting now
+        over: the rest of the current window, or the next one. Without a
+        window, both are now.
+        """
+        now = now if now is not None else time.time()
+        if not self.window:
+            return now, now
+        moment = datetime.fromtimestamp(now)
+        for start, end in _occurrences(self.window, moment):
+            if start <= moment < end:
+                return now, end.timestamp()
+            if moment < start:
+                return start.timestamp(), end.timestamp()
+
+    @staticmethod
+    def fraction(key):
+        """
+        Stable position in [0, 1) for key
+        """
+        return int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:8], 16) / 2 ** 32
+
+    def slot(self, key, bounds):
+        """
+        Epoch seconds at which the farmer identified by key should be sent to,
+        within bounds as returned by bounds()
+        """
+        start, end = bounds
+        return self.after_quiet(start + self.fraction(key) * (end - start), key)
+
+    def after_quiet(self, when, key=None):
+        """
+        Move a send time that falls in quiet hours to key's slot in the
+        spread after them (to the end of quiet hours without a key)
+        """
+        if not self.quiet_hours:
+            return when
+        moment = datetime.fromtimestamp(when)
+        for start, end in _occurrences(self.quiet_hours, moment):
+            if start <= moment < end:
+                if key is None:
+                    return end.timestamp()
+                return end.timestamp() + self.fraction(key) * self.spread
+        return when
+
+    def delay(self, when=None, key=None, now=None):
+        """
+        Seconds to hold a message for key due at when (default now), quiet hours included
+        """
+        now = now if now is not None else time.time()
+        return max(self.after_quiet(when if when is not None else now, key) - now, 0)
@@ -0,0 +1,87 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+
+import mp3
+
+
+class DigestBuilder:
+    """
+    Builds combined voice messages (a spoken welcome followed by several
+    notice audios) as single MP3 files.
+
+    A digest is named after the audio files it joins, so every farmer
+    receiving the same set of notices shares one pre-rendered file, built
+    once. Digests not requested for max_age seconds are pruned.
+    """
+
+    PREFIX = 'digest_'
+
+    def __init__(self, folder, max_age=7 * 24 * 3600):
+        self.folder = folder
+        self.max_age = max_age
+        self.built = 0
+        self.reused = 0
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._last_prune = 0
+
+    def filename_for(self, parts):
+        digest = hashlib.sha1('\n'.join(os.path.basename(part) for part in parts).encode('utf-8')).hexdigest()
+        return f'{self.PREFIX}{digest[:16]}.mp3'
+
+    def _lock_for(self, filename):
+        with self._locks_guard:
+            return self._locks.setdefault(filename, threading.Lock())
+
+    def build(self, parts):
+        """
+        Return the filename of the digest joining the MP3 files at paths parts,
+        building it on first use
+        """
+        filename = self.filename_for(parts)
+        path = os.path.join(self.folder, filename)
+
+        with self._lock_for(filename):
+            if os.path.exists(path):
+                os.utime(path)
+                with self._locks_guard:
+                    self.reused += 1
+                return filename
+
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            try:
+                mp3.concat(parts, tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        with self._locks_guard:
+            self.built += 1
+            self._locks.pop(filename, None)
+        logging.info(f"Built digest {filename} from {len(parts)} audio files")
+        self.prune()
+        return filename
+
+    def prune(self):
+        """
+        Delete digests that have not been used for max_age (at most once an hour)
+        """
+        now = time.time()
+        if now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        for entry in os.scandir(self.folder):
+            if not (entry.name.startswith(self.PREFIX) and entry.name.endswith('.mp3')):
+                continue
+            try:
+                if now - entry.stat().st_mtime > self.max_age:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+    def stats(self):
+        return {'built': self.built, 'reused': self.reused}
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS farmers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    district TEXT NOT NULL DEFAULT '',
+    language TEXT NOT NULL DEFAULT 'hi',
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_farmers_district ON farmers (district COLLATE NOCASE);
+"""
+
+
+def normalize_district(district):
+    """
+    Canonical form of a district name as typed at registration: single-spaced, title case
+    """
+    return ' '.join((district or '').split()).title()
+
+
+class FarmerStore:
+    """
+    Registered farmers, indexed by phone (unique) and district.
+    Rows are returned as plain dicts with the same keys farmers.json used.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.db.executescript(SCHEMA)
+        self.db.run_once('farmers_normalize_district', self._normalize_districts)
+
+    @staticmethod
+    def _normalize_districts(conn):
+        # Districts were once stored as typed; stray spaces and case kept farmers out of district broadcasts
+        rows = conn.execute("SELECT id, district FROM farmers").fetchall()
+        updates = [(normalize_district(row['district']), row['id']) for row in rows
+                   if normalize_district(row['district']) != row['district']]
+        conn.executemany("UPDATE farmers SET district = ? WHERE id = ?", updates)
+
+    @staticmethod
+    def _to_dict(row):
+        return {'id': row['id'], 'name': row['name'], 'phone': row['phone'], 'district': row['district'], 'language': row['language']}
+
+    def add(self, name, phone, district='', language='hi'):
+        """
+        Register a farmer
+        Returns True if added, False if the phone number is already registered
+        """
+        try:
+            self.db.execute(
+                "INSERT INTO farmers (phone, name, district, language, created_at) VALUES (?, ?, ?, ?, ?)",
+                (phone, name, normalize_district(district), language or 'hi', time.time())
+            )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def get(self, phone):
+        row = self.db.execute("SELECT * FROM farmers WHERE phone = ?", (phone,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def exists(self, phone):
+        return self.db.execute("SELECT 1 FROM farmers WHERE phone = ?", (phone,)).fetchone() is not None
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM farmers").fetchone()[0]
+
+    def districts(self):
+        """
+        Return the distinct districts farmers registered with
+        """
+        rows = self.db.execute("SELECT DISTINCT district FROM farmers WHERE district != ''").fetchall()
+        return [row['district'] for row in rows]
+
+    def count_until(self, until_id):
+        return self.db.execute("SELECT COUNT(*) FROM farmers WHERE id <= ?", (until_id,)).fetchone()[0]
+
+    def max_id(self):
+        return self.db.execute("SELECT COALESCE(MAX(id), 0) FROM farmers").fetchone()[0]
+
+    def page(self, after_id=0, limit=500, until_id=None):
+        """
+        Return up to limit farmers with after_id < id (<= until_id), in id order.
+        Ids only grow, so the last id of a page is a stable resume cursor.
+        """
+        if until_id is None:
+            rows = self.db.execute(
+                "SELECT * FROM farmers WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+            ).fetchall()
+        else:
+            rows = self.db.execute(
+                "SELECT * FROM farmers WHERE id > ? AND id <= ? ORDER BY id LIMIT ?", (after_id, until_id, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def iter_all(self, batch_size=500):
+        """
+        Yield every farmer in registration order, reading batch_size rows at a
+        time so a broadcast never holds the whole roster in memory
+        """
+        last_id = 0
+        while True:
+            farmers = self.page(last_id, batch_size)
+            if not farmers:
+                return
+            yield from farmers
+            last_id = farmers[-1]['id']
+
+    def iter_by_district(self, district, batch_size=500):
+        """
+        Yield farmers registered in a district (case-insensitive)
+        """
+        last_id = 0
+        while True:
+            rows = self.db.execute(
+                "SELECT * FROM farmers WHERE district = ? COLLATE NOCASE AND id > ? ORDER BY id LIMIT ?",
+                (district, last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._to_dict(row)
+            last_id = rows[-1]['id']
+
+    def migrate_from_json(self, json_path):
+        """
+        One-time import of an existing farmers.json. The file is renamed to
+        <name>.migrated afterwards so the import never runs twice.
+        Returns the number of farmers imported.
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        try:
+            with open(json_path, 'r') as f:
+                farmers = json.load(f)
+        except ValueError as e:
+            logging.error(f"Could not read {json_path} for migration: {e}")
+            return 0
+
+        imported = 0
+        now = time.time()
+        with self.db.transaction() as conn:
+            for farmer in farmers:
+                phone = farmer.get('phone')
+                if not phone:
+                    continue
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO farmers (phone, name, district, language, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (phone, farmer.get('name', ''), normalize_district(farmer.get('district')), farmer.get('language', 'hi'), now)
+                )
+                imported += cursor.rowcount
+
+        os.replace(json_path, f'{json_path}.migrated')
+        logging.info(f"Migrated {imported} farmers from {json_path}")
+        return imported
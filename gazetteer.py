@@ -0,0 +1,160 @@
+import os
+import re
+import json
+import logging
+
+STATES = [
+    'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chhattisgarh', 'Goa', 'Gujarat',
+    'Haryana', 'Himachal Pradesh', 'Jharkhand', 'Karnataka', 'Kerala', 'Madhya Pradesh',
+    'Maharashtra', 'Manipur', 'Meghalaya', 'Mizoram', 'Nagaland', 'Odisha', 'Punjab', 'Rajasthan',
+    'Sikkim', 'Tamil Nadu', 'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand', 'West Bengal',
+    'Andaman and Nicobar Islands', 'Chandigarh', 'Dadra and Nagar Haveli and Daman and Diu',
+    'Delhi', 'Jammu and Kashmir', 'Ladakh', 'Lakshadweep', 'Puducherry',
+]
+
+STATE_ALIASES = {
+    'बिहार': 'Bihar', 'उत्तर प्रदेश': 'Uttar Pradesh', 'मध्य प्रदेश': 'Madhya Pradesh',
+    'राजस्थान': 'Rajasthan', 'महाराष्ट्र': 'Maharashtra', 'पंजाब': 'Punjab', 'हरियाणा': 'Haryana',
+    'गुजरात': 'Gujarat', 'झारखंड': 'Jharkhand', 'छत्तीसगढ़': 'Chhattisgarh', 'उत्तराखंड': 'Uttarakhand',
+    'orissa': 'Odisha', 'j&k': 'Jammu and Kashmir',
+}
+
+CROPS = {
+    'wheat': 'wheat', 'गेहूं': 'wheat', 'गेहूँ': 'wheat',
+    'rice': 'rice', 'paddy': 'rice', 'धान': 'rice', 'चावल': 'rice',
+    'maize': 'maize', 'मक्का': 'maize',
+    'cotton': 'cotton', 'कपास': 'cotton',
+    'sugarcane': 'sugarcane', 'गन्ना': 'sugarcane',
+    'soybean': 'soybean', 'soyabean': 'soybean', 'सोयाबीन': 'soybean',
+    'mustard': 'mustard', 'सरसों': 'mustard',
+    'chana': 'gram', 'चना': 'gram',
+    'pulses': 'pulses', 'दलहन': 'pulses',
+    'millet': 'millets', 'millets': 'millets', 'bajra': 'millets', 'jowar': 'millets', 'बाजरा': 'millets',
+    'groundnut': 'groundnut', 'मूंगफली': 'groundnut',
+    'potato': 'potato', 'आलू': 'potato',
+    'onion': 'onion', 'प्याज': 'onion',
+    'tomato': 'tomato', 'टमाटर': 'tomato',
+    'jute': 'jute', 'जूट': 'jute',
+}
+
+# Phrases that mark a notice as applying everywhere, whatever places it mentions
+NATIONAL_TERMS = ['all india', 'pan india', 'nationwide', 'all states', 'across the country', 'राष्ट्रीय', 'देशभर']
+
+TOKEN = re.compile(r'[\w\u0900-\u097F&]+')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+class Gazetteer:
+    """
+    Keyword index of places and crops used to tag notices at ingest.
+
+    Terms (states, crops, and the curated districts and aliases of an
+    optional JSON file) are indexed as lowercase token tuples, so tagging a
+    notice is one pass over its n-grams. The JSON file may contain
+    {"districts": {"Patna": "Bihar", ...}, "aliases": {"पटना": "Patna"}, "crops": {"arhar": "pulses"}};
+    the district-to-state map lets state-level notices reach those districts.
+    Districts typed by farmers are never routing terms: only curated names
+    narrow a notice, and a term that could mean several places is ignored.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.district_states = {}
+        self.aliases = {}
+        self.crops = dict(CROPS)
+        self._index = {}
+        self._max_terms = 1
+        self._load_file()
+        self._build()
+
+    def _load_file(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError as e:
+            logging.error(f"Could not read gazetteer {self.path}: {e}")
+            return
+        self.district_states = data.get('districts', {})
+        self.aliases = data.get('aliases', {})
+        self.crops.update(data.get('crops', {}))
+
+    def _build(self):
+        index = {}
+        ambiguous = set()
+
+        def add(term, tag):
+            tokens = tuple(tokenize(term))
+            if not tokens or len(''.join(tokens)) < 3 or tokens in ambiguous:
+                return
+            if tokens in index and index[tokens] != tag:
+                # e.g. a district named like a state or a crop: tag neither
+                ambiguous.add(tokens)
+                del index[tokens]
+                return
+            index[tokens] = tag
+
+        for state in STATES:
+            add(state, ('states', state))
+        for alias, state in STATE_ALIASES.items():
+            add(alias, ('states', state))
+        for word, crop in self.crops.items():
+            add(word, ('crops', crop))
+        for district in self.district_states:
+            add(district, ('districts', district))
+        for alias, district in self.aliases.items():
+            if district in self.district_states:
+                add(alias, ('districts', district))
+        for term in NATIONAL_TERMS:
+            add(term, ('national', True))
+
+        self._index = index
+        self._max_terms = max((len(tokens) for tokens in index), default=1)
+
+    def tag(self, text):
+        """
+        Return {'districts': [...], 'states': [...], 'crops': [...], 'national': bool}
+        for text. A notice naming no district or state is national.
+        """
+        tokens = tokenize(text)
+        found = {'districts': set(), 'states': set(), 'crops': set()}
+        national = False
+        index, max_terms = self._index, self._max_terms
+
+        for start in range(len(tokens)):
+            for size in range(min(max_terms, len(tokens) - start), 0, -1):
+                tag = index.get(tuple(tokens[start:start + size]))
+                if tag:
+                    kind, value = tag
+                    if kind == 'national':
+                        national = True
+                    else:
+                        found[kind].add(value)
+                    break
+
+        tags = {kind: sorted(values) for kind, values in found.items()}
+        tags['national'] = national or not (tags['districts'] or tags['states'])
+        return tags
+
+    def target_districts(self, tags):
+        """
+        Districts a tagged notice should be sent to, or None if it goes to
+        every farmer (national, or a state whose districts are unknown)
+        """
+        if not tags or tags.get('national', True):
+            return None
+        named = tags.get('districts', [])
+        districts = set(named)
+        for state in tags.get('states', []):
+            state_districts = [d for d, s in self.district_states.items() if s == state]
+            if not state_districts:
+                # Without a district map, a state is only context when districts are named too
+                if not named:
+                    return None
+                continue
+            districts.update(state_districts)
+        return sorted(districts)
@@ -0,0 +1,191 @@
+import time
+import json
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    stages TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    claimed_by TEXT,
+    claimed_at REAL,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+"""
+
+
+class JobQueue:
+    """
+    Durable background jobs stored in SQLite.
+
+    Request handlers submit(kind, params) and return immediately; worker
+    threads claim queued jobs and run the handler registered for their kind
+    as fn(job_id, params), whose return value is stored as the job result.
+    Handlers report progress through stage(job_id, name), which records each
+    stage's status and duration. While a job runs, its worker heartbeats
+    every claim_timeout/3 seconds; a running job is only picked up again by
+    another worker once its heartbeat is claim_timeout old (its process died).
+    """
+
+    def __init__(self, db, workers=2, claim_timeout=120, poll_interval=2):
+        self.db = db
+        self.workers = workers
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self.worker_id = uuid.uuid4().hex
+        self.handlers = {}
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self.db.executescript(SCHEMA)
+
+    def register(self, kind, fn):
+        self.handlers[kind] = fn
+
+    def submit(self, kind, params):
+        """
+        Queue a job and return its id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self.db.execute(
+            "INSERT INTO jobs (id, kind, params, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params, ensure_ascii=False), now, now)
+        )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'stages': json.loads(row['stages']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    def claim(self):
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND COALESCE(heartbeat_at, claimed_at) < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - self.claim_timeout,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', claimed_by = ?, claimed_at = ?, heartbeat_at = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (self.worker_id, now, now, now, row['id'])
+                )
+        return row
+
+    def _update_stage(self, job_id, name, **info):
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(row['stages'])
+            stages.setdefault(name, {}).update(info)
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET stages = ?, heartbeat_at = ?, updated_at = ? WHERE id = ? AND claimed_by = ?",
+                (json.dumps(stages, ensure_ascii=False), now, now, job_id, self.worker_id)
+            )
+
+    def _heartbeat(self, job_id, stop):
+        # Runs beside the handler, so a long stage (e.g. dispatch over a large roster) keeps its claim
+        while not stop.wait(self.claim_timeout / 3):
+            try:
+                self.db.execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND claimed_by = ?",
+                    (time.time(), job_id, self.worker_id)
+                )
+            except Exception as e:
+                logging.error(f"Job {job_id} heartbeat failed: {e}")
+
+    @contextmanager
+    def stage(self, job_id, name):
+        """
+        Record a stage of a running job: running, then done (with its
+        duration) or failed. Yields a dict whose contents are saved with
+        the stage when it finishes.
+        """
+        info = {}
+        started = time.monotonic()
+        self._update_stage(job_id, name, status='running')
+        try:
+            yield info
+        except Exception as e:
+            self._update_stage(job_id, name, status='failed', error=str(e),
+                               seconds=round(time.monotonic() - started, 3), **info)
+            raise
+        self._update_stage(job_id, name, status='done', seconds=round(time.monotonic() - started, 3), **info)
+
+    def run(self, row):
+        handler = self.handlers.get(row['kind'])
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(row['id'], stop),
+                         name=f"job-heartbeat-{row['id'][:8]}", daemon=True).start()
+        try:
+            self._run(row, handler)
+        finally:
+            stop.set()
+
+    def _run(self, row, handler):
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind {row['kind']}")
+            result = handler(row['id'], json.loads(row['params']))
+        except Exception as e:
+            logging.error(f"Job {row['id']} ({row['kind']}) failed: {e}")
+            self.db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ? AND claimed_by = ?",
+                (str(e), time.time(), row['id'], self.worker_id)
+            )
+            return
+        self.db.execute(
+            "UPDATE jobs SET status = 'done', result = ?, updated_at = ? WHERE id = ? AND claimed_by = ?",
+            (json.dumps(result, ensure_ascii=False) if result is not None else None, time.time(),
+             row['id'], self.worker_id)
+        )
+        logging.info(f"Job {row['id']} ({row['kind']}) finished")
+
+    def _worker(self):
+        while True:
+            try:
+                row = self.claim()
+            except Exception as e:
+                logging.error(f"Job claim failed: {e}")
+                row = None
+
+            if not row:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self.run(row)
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logging.info(f"Job queue started with {self.workers} workers")
@@ -0,0 +1,121 @@
+import os
+import time
+import uuid
+import atexit
+import socket
+import logging
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    acquired_at REAL NOT NULL
+);
+"""
+
+
+class LeaderLease:
+    """
+    Lease-based leader election over a row in the shared SQLite database.
+
+    Every process runs a renew thread that tries to take or extend the lease
+    named `name` every ttl/3 seconds. Only the holder of an unexpired lease
+    is leader; if it dies, the lease expires after ttl and another process
+    takes over. on_elected / on_demoted are called on the renew thread when
+    this process gains or loses leadership.
+    """
+
+    def __init__(self, db, name, ttl=30, on_elected=None, on_demoted=None):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = ttl / 3
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.is_leader = False
+        self.expires_at = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.db.executescript(SCHEMA)
+
+    def try_acquire(self):
+        """
+        Take the lease if it is free, expired or already ours; return
+        whether this process holds it now
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+            if row and row['holder'] != self.holder and row['expires_at'] > now:
+                return False
+            if row and row['holder'] == self.holder:
+                conn.execute(
+                    "UPDATE leases SET expires_at = ? WHERE name = ?",
+                    (now + self.ttl, self.name)
+                )
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, holder, expires_at, acquired_at) VALUES (?, ?, ?, ?)",
+                    (self.name, self.holder, now + self.ttl, now)
+                )
+        self.expires_at = now + self.ttl
+        return True
+
+    def release(self):
+        """
+        Give up the lease so another process can take over immediately
+        """
+        self._stop.set()
+        if self.is_leader:
+            self._set_leader(False)
+        self.db.execute(
+            "UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?",
+            (self.name, self.holder)
+        )
+
+    def _set_leader(self, leader):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        callback = self.on_elected if leader else self.on_demoted
+        logging.info(f"{self.holder} {'became' if leader else 'is no longer'} leader for {self.name}")
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Leader callback for {self.name} failed: {e}")
+
+    def _renew_loop(self):
+        while not self._stop.is_set():
+            try:
+                leader = self.try_acquire()
+            except Exception as e:
+                logging.error(f"Lease renewal for {self.name} failed: {e}")
+                # Keep leading only while the last successful renewal still covers us
+                leader = self.is_leader and time.time() < self.expires_at - self.renew_interval
+            self._set_leader(leader)
+            self._stop.wait(self.renew_interval)
+
+    def start(self):
+        with self._start_lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._renew_loop, name=f'lease-{self.name}', daemon=True)
+            self._thread.start()
+        atexit.register(self.release)
+
+    def status(self):
+        row = self.db.execute(
+            "SELECT holder, expires_at, acquired_at FROM leases WHERE name = ?", (self.name,)
+        ).fetchone()
+        return {
+            'name': self.name,
+            'holder': row['holder'] if row else None,
+            'expires_in': round(row['expires_at'] - time.time(), 1) if row else None,
+            'this_process': self.holder,
+            'is_leader': self.is_leader,
+        }
@@ -0,0 +1,115 @@
+import time
+import logging
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    idempotency_key TEXT PRIMARY KEY,
+    farmer TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sid TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_farmer ON deliveries (farmer);
+"""
+
+
+def normalize_farmer(phone):
+    return phone[len('whatsapp:'):] if phone.startswith('whatsapp:') else phone
+
+
+def make_key(phone, item_id):
+    """
+    Idempotency key for sending item_id (a notice or audio file) to one farmer;
+    item ids never contain spaces
+    """
+    return f'{normalize_farmer(phone)}|{item_id}'
+
+
+class DeliveryLedger:
+    """
+    Record of what each farmer has been sent, keyed by (farmer, item id).
+
+    claim() atomically reserves a delivery before it is queued, so concurrent
+    or repeated broadcasts never queue the same item to the same farmer
+    twice. Rows move queued -> sent (with the Twilio SID) or failed; failed
+    deliveries can be claimed again by a later broadcast.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self.db.executescript(SCHEMA)
+
+    def claim(self, phone, item_id):
+        """
+        Reserve delivery of item_id to phone; returns the idempotency key,
+        or None if the item was already queued or sent to this farmer
+        """
+        key = make_key(phone, item_id)
+        now = time.time()
+        cursor = self.db.execute(
+            "INSERT INTO deliveries (idempotency_key, farmer, item_id, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?) "
+            "ON CONFLICT (idempotency_key) DO UPDATE SET status = 'queued', last_error = NULL, updated_at = ? "
+            "WHERE deliveries.status = 'failed'",
+            (key, normalize_farmer(phone), item_id, now, now, now)
+        )
+        if cursor.rowcount:
+            return key
+        with self._lock:
+            self.skipped += 1
+        return None
+
+    def has(self, phone, item_id):
+        """
+        Whether item_id is already queued or sent to phone
+        """
+        row = self.db.execute(
+            "SELECT 1 FROM deliveries WHERE idempotency_key = ? AND status != 'failed'",
+            (make_key(phone, item_id),)
+        ).fetchone()
+        return row is not None
+
+    def pending(self, phone, item_ids):
+        """
+        Return the item ids from item_ids this farmer has not received yet, in order
+        """
+        return [item_id for item_id in item_ids if not self.has(phone, item_id)]
+
+    def claim_all(self, phone, item_ids):
+        """
+        Reserve several items delivered together in one message (a digest);
+        returns the claimed keys joined by spaces, or None if all were already delivered
+        """
+        keys = [key for key in (self.claim(phone, item_id) for item_id in item_ids) if key]
+        return ' '.join(keys) or None
+
+    def mark_sent(self, keys, sid):
+        """
+        Mark a delivery sent; keys may hold several space-separated keys (see claim_all)
+        """
+        now = time.time()
+        self.db.conn.executemany(
+            "UPDATE deliveries SET status = 'sent', sid = ?, last_error = NULL, updated_at = ? "
+            "WHERE idempotency_key = ?",
+            [(sid, now, key) for key in keys.split()]
+        )
+
+    def mark_failed(self, keys, error):
+        now = time.time()
+        self.db.conn.executemany(
+            "UPDATE deliveries SET status = 'failed', last_error = ?, updated_at = ? WHERE idempotency_key = ?",
+            [(str(error), now, key) for key in keys.split()]
+        )
+        logging.warning(f"Delivery {keys} failed: {error}")
+
+    def stats(self):
+        rows = self.db.execute("SELECT status, COUNT(*) AS n FROM deliveries GROUP BY status").fetchall()
+        stats = {row['status']: row['n'] for row in rows}
+        stats['skipped'] = self.skipped
+        return stats
@@ -0,0 +1,110 @@
+BITRATES_V1_L3 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0]
+BITRATES_V2_L3 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0]
+SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+
+
+def id3v2_size(data):
+    """
+    Return the length of a leading ID3v2 tag (0 if there is none)
+    """
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def parse_frame_header(data, offset):
+    """
+    Parse an MPEG Layer III frame header at offset
+    Returns (frame_length, samples_per_frame, sample_rate) or None if there is no valid header
+    """
+    if offset + 4 > len(data):
+        return None
+    b1, b2 = data[offset + 1], data[offset + 2]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    if version == 1 or layer != 1:  # reserved version, or not Layer III
+        return None
+
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0x03
+    padding = (b2 >> 1) & 0x01
+    if sample_rate_index == 3:
+        return None
+
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    if version == 3:
+        bitrate = BITRATES_V1_L3[bitrate_index] * 1000
+        samples = 1152
+        frame_length = 144 * bitrate // sample_rate + padding
+    else:
+        bitrate = BITRATES_V2_L3[bitrate_index] * 1000
+        samples = 576
+        frame_length = 72 * bitrate // sample_rate + padding
+
+    if not bitrate or frame_length < 4:
+        return None
+    return frame_length, samples, sample_rate
+
+
+def iter_frames(data):
+    """
+    Yield (offset, length, samples_per_frame, sample_rate) for each audio frame,
+    skipping ID3 tags and any garbage between frames
+    """
+    offset = id3v2_size(data)
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+
+    while offset < end:
+        header = parse_frame_header(data, offset)
+        if header is None:
+            offset += 1
+            continue
+        length, samples, sample_rate = header
+        if offset + length > end:
+            break
+        yield offset, length, samples, sample_rate
+        offset += length
+
+
+def duration(path):
+    """
+    Return the duration of an MP3 file in seconds
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return sum(samples / sample_rate for _, _, samples, sample_rate in iter_frames(data))
+
+
+def audio_frames(data):
+    """
+    Return the raw audio frames of an MP3 as bytes, without ID3 tags or a
+    leading Xing/Info (VBR) header frame, ready to be joined with others
+    """
+    frames = []
+    for i, (offset, length, _, _) in enumerate(iter_frames(data)):
+        frame = data[offset:offset + length]
+        if i == 0 and (b'Xing' in frame[:64] or b'Info' in frame[:64]):
+            continue
+        frames.append(frame)
+    return b''.join(frames)
+
+
+def concat(paths, dest_path):
+    """
+    Join several MP3 files into one by concatenating their audio frames
+    """
+    with open(dest_path, 'wb') as out:
+        for path in paths:
+            with open(path, 'rb') as f:
+                out.write(audio_frames(f.read()))
@@ -0,0 +1,253 @@
+import os
+import json
+import bisect
+import hashlib
+import logging
+import threading
+
+
+def make_notice_id(text, timestamp):
+    """
+    Build a stable id for notices that don't come with one (e.g. manual notices)
+    """
+    digest = hashlib.sha1(f'{timestamp}\x1f{text}'.encode('utf-8')).hexdigest()
+    return f'manual-{digest[:12]}'
+
+
+class NoticeStore:
+    """
+    Append-only JSONL log of notices with an in-memory time-ordered index.
+
+    Every write appends one line; a later record with the same id replaces
+    the earlier one. The index maps each id to the byte offset of its latest
+    record and keeps (time, id) pairs sorted, so "latest N" and "since T"
+    read only the records they return. The log is compacted once superseded
+    records outnumber live ones.
+    """
+
+    def __init__(self, path, compact_min_dead=100):
+        self.path = path
+        self.compact_min_dead = compact_min_dead
+        self._lock = threading.RLock()
+        self._offsets = {}
+        self._times = {}
+        self._order = []
+        self._dead = 0
+        self._end = 0
+        self._inode = None
+        self.version = 0
+        if not os.path.exists(path):
+            open(path, 'a').close()
+        self._reload()
+
+    # Index maintenance
+
+    def _reload(self):
+        self._offsets = {}
+        self._times = {}
+        self._order = []
+        self._dead = 0
+        self._end = 0
+        self._inode = os.stat(self.path).st_ino
+        self._scan_tail()
+
+    def _scan_tail(self):
+        """
+        Index any records appended since the last scan (possibly by another process)
+        """
+        with open(self.path, 'rb') as f:
+            f.seek(self._end)
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if not line.endswith(b'\n'):
+                    # Partial write in progress; pick it up next time
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning(f"Skipping corrupt record at offset {offset} in {self.path}")
+                    self._end = f.tell()
+                    continue
+                self._index(record, offset)
+                self._end = f.tell()
+
+    def _index(self, record, offset):
+        notice_id = record['id']
+        notice_time = record.get('time', '')
+        if notice_id in self._offsets:
+            self._dead += 1
+            old_key = (self._times[notice_id], notice_id)
+            i = bisect.bisect_left(self._order, old_key)
+            if i < len(self._order) and self._order[i] == old_key:
+                del self._order[i]
+        self._offsets[notice_id] = offset
+        self._times[notice_id] = notice_time
+        bisect.insort(self._order, (notice_time, notice_id))
+        self.version += 1
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._end:
+            # Compacted by another process
+            self._reload()
+        elif stat.st_size > self._end:
+            self._scan_tail()
+
+    def _read(self, f, notice_id):
+        f.seek(self._offsets[notice_id])
+        return json.loads(f.readline())
+
+    def _read_many(self, ids):
+        with open(self.path, 'rb') as f:
+            return [self._read(f, notice_id) for notice_id in ids]
+
+    # Public API
+
+    def append(self, notice):
+        """
+        Append a notice (or a new version of an existing one) to the log
+        """
+        self.append_many([notice])
+        return notice
+
+    def append_many(self, notices):
+        """
+        Append several notices with a single write
+        """
+        if any(not notice.get('id') for notice in notices):
+            raise ValueError("notice must have an id")
+        data = b''.join((json.dumps(notice, ensure_ascii=False) + '\n').encode('utf-8') for notice in notices)
+        with self._lock:
+            self._refresh()
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self._scan_tail()
+            if self._dead >= max(self.compact_min_dead, len(self._offsets)):
+                self.compact()
+        return notices
+
+    def get(self, notice_id):
+        with self._lock:
+            self._refresh()
+            if notice_id not in self._offsets:
+                return None
+            return self._read_many([notice_id])[0]
+
+    def contains(self, notice_id):
+        with self._lock:
+            self._refresh()
+            return notice_id in self._offsets
+
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return len(self._offsets)
+
+    def latest(self, count=3):
+        """
+        Return the newest count notices, newest first
+        """
+        with self._lock:
+            self._refresh()
+            ids = [notice_id for _, notice_id in reversed(self._order[-count:])] if count > 0 else []
+            return self._read_many(ids)
+
+    def since(self, timestamp):
+        """
+        Return notices with time strictly after timestamp, oldest first
+        """
+        with self._lock:
+            self._refresh()
+            i = bisect.bisect_right(self._order, (timestamp, '\U0010ffff'))
+            return self._read_many([notice_id for _, notice_id in self._order[i:]])
+
+    def page(self, before=None, limit=20):
+        """
+        Return up to limit notices older than the cursor before, newest first,
+        plus the cursor for the next (older) page or None if there is none.
+        Cursors are opaque strings built from a notice's (time, id).
+        """
+        with self._lock:
+            self._refresh()
+            if before:
+                before_time, _, before_id = before.partition('|')
+                end = bisect.bisect_left(self._order, (before_time, before_id))
+            else:
+                end = len(self._order)
+            start = max(0, end - limit)
+            keys = self._order[start:end]
+            notices = self._read_many([notice_id for _, notice_id in reversed(keys)])
+            next_cursor = f'{keys[0][0]}|{keys[0][1]}' if keys and start > 0 else None
+            return notices, next_cursor
+
+    def state_token(self):
+        """
+        Return a token that changes whenever the log is written (by any process)
+        """
+        with self._lock:
+            self._refresh()
+            return f'{self._inode}-{self._end}'
+
+    def last_modified(self):
+        """
+        Return the time of the last write to the log as a POSIX timestamp
+        """
+        return os.path.getmtime(self.path)
+
+    def all(self):
+        """
+        Return every notice, oldest first
+        """
+        return self.since('')
+
+    def compact(self):
+        """
+        Rewrite the log with only the latest record of each notice, in time order
+        """
+        with self._lock:
+            self._refresh()
+            tmp_path = f'{self.path}.compact'
+            with open(self.path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                for _, notice_id in self._order:
+                    src.seek(self._offsets[notice_id])
+                    dst.write(src.readline())
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_path, self.path)
+            dead = self._dead
+            self._reload()
+            logging.info(f"Compacted {self.path}: dropped {dead} superseded records")
+
+    def migrate_from_json(self, json_path):
+        """
+        One-time import of an existing notices.json. The file is renamed to
+        <name>.migrated afterwards so the import never runs twice.
+        Returns the number of notices imported.
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        try:
+            with open(json_path, 'r') as f:
+                notices = json.load(f)
+        except ValueError as e:
+            logging.error(f"Could not read {json_path} for migration: {e}")
+            return 0
+
+        with self._lock:
+            with open(self.path, 'ab') as f:
+                for notice in notices:
+                    if not notice.get('id'):
+                        notice['id'] = make_notice_id(notice.get('text', ''), notice.get('time', ''))
+                    f.write((json.dumps(notice, ensure_ascii=False) + '\n').encode('utf-8'))
+            self._scan_tail()
+
+        os.replace(json_path, f'{json_path}.migrated')
+        logging.info(f"Migrated {len(notices)} notices from {json_path}")
+        return len(notices)
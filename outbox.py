@@ -0,0 +1,400 @@
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    to_number TEXT NOT NULL,
+    body TEXT,
+    media_url TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_at REAL,
+    sid TEXT,
+    last_error TEXT,
+    idempotency_key TEXT,
+    job_id TEXT,
+    lane TEXT NOT NULL DEFAULT 'bulk',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_job ON outbox (job_id);
+CREATE INDEX IF NOT EXISTS idx_outbox_lane_due ON outbox (lane, status, next_attempt_at);
+"""
+
+# Priority lanes and their share of send capacity when all of them have work:
+# interactive (registration replies), manual (admin actions), bulk (broadcasts)
+LANE_WEIGHTS = {
+    'interactive': 10,
+    'manual': 3,
+    'bulk': 1,
+}
+
+
+def is_retryable(error):
+    """
+    Decide whether a failed send is worth retrying. Twilio client errors
+    (4xx other than 429) are permanent; throttling, server errors and
+    network failures are transient.
+    """
+    status = getattr(error, 'status', None)
+    if isinstance(status, int) and 400 <= status < 500 and status != 429:
+        return False
+    return True
+
+
+class Outbox:
+    """
+    Durable queue of outbound WhatsApp messages stored in SQLite.
+
+    Senders enqueue rows; worker threads claim due rows, deliver them with
+    send_fn(to_number, body, media_url) -> sid, and reschedule failures with
+    exponential backoff. Rows claimed by a process that died are reclaimed
+    after claim_timeout, so pending work survives restarts.
+
+    on_sent(row, sid) and on_failed(row, error) are called when a row is
+    delivered or given up on, e.g. to update the delivery ledger.
+
+    If submit_fn(to_number, body, media_url) -> Future is given (e.g. the
+    async dispatcher), a single drain thread keeps up to max_in_flight sends
+    outstanding instead of blocking one worker thread per send.
+
+    Every row belongs to a priority lane. Claims share capacity between
+    lanes with due rows by smooth weighted round robin (lane_weights), and
+    with a rate_limiter nothing more is claimed while more than max_backlog
+    seconds of sends are already waiting for tokens, so a message queued in
+    the interactive lane is never stuck behind a long bulk backlog.
+
+    Sent and failed rows are kept for retention seconds (for job progress
+    and debugging) and then pruned by the workers, at most once per
+    prune_interval.
+    """
+
+    def __init__(self, db, send_fn, workers=4, batch_size=10, max_attempts=6,
+                 base_delay=5, max_delay=3600, claim_timeout=300, poll_interval=2,
+                 submit_fn=None, max_in_flight=200, on_sent=None, on_failed=None,
+                 lane_weights=None, rate_limiter=None, max_backlog=2.0,
+                 retention=7 * 86400, prune_interval=3600):
+        self.db = db
+        self.send_fn = send_fn
+        self.submit_fn = submit_fn
+        self.max_in_flight = max_in_flight
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.lane_weights = dict(lane_weights or LANE_WEIGHTS)
+        self.rate_limiter = rate_limiter
+        self.max_backlog = max_backlog
+        self._credits = {lane: 0 for lane in self.lane_weights}
+        self._latencies = {lane: deque(maxlen=1000) for lane in self.lane_weights}
+        self._sent_counts = {lane: 0 for lane in self.lane_weights}
+        self._stats_lock = threading.Lock()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self._last_prune = 0
+        self._prune_lock = threading.Lock()
+        self.worker_id = uuid.uuid4().hex
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self.db.executescript(SCHEMA)
+
+    def enqueue(self, to_number, body, media_url=None, delay=0, idempotency_key=None, job_id=None, lane='bulk'):
+        """
+        Persist a message for delivery in a priority lane and return its row id
+        """
+        if lane not in self.lane_weights:
+            raise ValueError(f"Unknown outbox lane: {lane}")
+        now = time.time()
+        cursor = self.db.execute(
+            "INSERT INTO outbox (to_number, body, media_url, idempotency_key, job_id, lane, next_attempt_at, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (to_number, body, media_url, idempotency_key, job_id, lane, now + delay, now, now)
+        )
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def _pick(self, candidates, limit):
+        """
+        Choose up to limit rows from the per-lane candidate lists by smooth
+        weighted round robin; credits carry over between claims
+        """
+        picked = []
+        positions = {lane: 0 for lane in candidates}
+        while len(picked) < limit:
+            active = [lane for lane, rows in candidates.items() if positions[lane] < len(rows)]
+            if not active:
+                break
+            total = sum(self.lane_weights[lane] for lane in active)
+            for lane in active:
+                self._credits[lane] += self.lane_weights[lane]
+            lane = max(active, key=lambda name: self._credits[name])
+            self._credits[lane] -= total
+            picked.append(candidates[lane][positions[lane]])
+            positions[lane] += 1
+        return picked
+
+    def claim(self, limit):
+        """
+        Atomically claim up to limit due rows for this process, sharing the
+        claim between priority lanes by weight
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE status = 'sending' AND claimed_at < ? ORDER BY id LIMIT ?",
+                (now - self.claim_timeout, limit)
+            ).fetchall()
+            candidates = {
+                lane: conn.execute(
+                    "SELECT * FROM outbox WHERE lane = ? AND status = 'pending' AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at, id LIMIT ?",
+                    (lane, now, limit - len(rows))
+                ).fetchall()
+                for lane in self.lane_weights
+            } if len(rows) < limit else {}
+            rows += self._pick(candidates, limit - len(rows))
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET status = 'sending', claimed_by = ?, claimed_at = ?, updated_at = ? WHERE id = ?",
+                    [(self.worker_id, now, now, row['id']) for row in rows]
+                )
+        return rows
+
+    def mark_sent(self, row_id, sid):
+        now = time.time()
+        self.db.execute(
+            "UPDATE outbox SET status = 'sent', sid = ?, attempts = attempts + 1, last_error = NULL, updated_at = ? "
+            "WHERE id = ?",
+            (sid, now, row_id)
+        )
+
+    def mark_failed(self, row, error):
+        """
+        Reschedule a failed row with exponential backoff, or give up on it
+        after max_attempts or a permanent error
+        """
+        now = time.time()
+        attempts = row['attempts'] + 1
+        if attempts >= self.max_attempts or not is_retryable(error):
+            self.db.execute(
+                "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (attempts, str(error), now, row['id'])
+            )
+            logging.error(f"Giving up on message {row['id']} to {row['to_number']} after {attempts} attempts: {error}")
+            self._notify(self.on_failed, row, error)
+            return
+
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        self.db.execute(
+            "UPDATE outbox SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ?, "
+            "claimed_by = NULL, claimed_at = NULL, updated_at = ? WHERE id = ?",
+            (attempts, str(error), now + delay, now, row['id'])
+        )
+        logging.warning(f"Message {row['id']} to {row['to_number']} failed (attempt {attempts}), retrying in {delay}s: {error}")
+
+    def _record_latency(self, row):
+        lane = row['lane'] if row['lane'] in self._latencies else 'bulk'
+        with self._stats_lock:
+            self._latencies[lane].append(time.time() - row['created_at'])
+            self._sent_counts[lane] += 1
+
+    def _claim_budget(self, limit):
+        """
+        How many rows to claim now: with a rate limiter, only as many as fit
+        in the max_backlog seconds not already taken by sends waiting for tokens
+        """
+        if self.rate_limiter is None or limit <= 0:
+            return max(0, limit)
+        spare = self.max_backlog - self.rate_limiter.backlog()
+        if spare <= 0:
+            return 0
+        return max(1, min(limit, int(spare * self.rate_limiter.rate)))
+
+    def _notify(self, callback, row, value):
+        if not callback:
+            return
+        try:
+            callback(row, value)
+        except Exception as e:
+            logging.error(f"Outbox callback for message {row['id']} failed: {e}")
+
+    def deliver(self, row):
+        try:
+            sid = self.send_fn(row['to_number'], row['body'], row['media_url'])
+        except Exception as e:
+            self.mark_failed(row, e)
+            return False
+        self.mark_sent(row['id'], sid)
+        self._record_latency(row)
+        self._notify(self.on_sent, row, sid)
+        logging.info(f"Sent WhatsApp message to {row['to_number']}: SID {sid}")
+        return True
+
+    def _complete(self, row, future):
+        try:
+            sid = future.result()
+        except Exception as e:
+            self.mark_failed(row, e)
+            return
+        self.mark_sent(row['id'], sid)
+        self._record_latency(row)
+        self._notify(self.on_sent, row, sid)
+        logging.info(f"Sent WhatsApp message to {row['to_number']}: SID {sid}")
+
+    def _submit(self, row):
+        """
+        Hand a claimed row to submit_fn; a row that cannot even be submitted
+        goes through the same retry path as a failed send
+        """
+        try:
+            return self.submit_fn(row['to_number'], row['body'], row['media_url'])
+        except Exception as e:
+            self.mark_failed(row, e)
+            return None
+
+    def prune(self, now=None):
+        """
+        Delete sent and failed rows last updated more than retention seconds ago
+        Returns the number of rows deleted
+        """
+        now = now if now is not None else time.time()
+        cursor = self.db.execute(
+            "DELETE FROM outbox WHERE status IN ('sent', 'failed') AND updated_at < ?",
+            (now - self.retention,)
+        )
+        if cursor.rowcount:
+            logging.info(f"Pruned {cursor.rowcount} finished outbox messages")
+        return cursor.rowcount
+
+    def _maybe_prune(self):
+        now = time.time()
+        with self._prune_lock:
+            if now - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = now
+        try:
+            self.prune(now)
+        except Exception as e:
+            logging.error(f"Outbox prune failed: {e}")
+
+    def _async_worker(self):
+        in_flight = {}
+        while True:
+            self._maybe_prune()
+            budget = self._claim_budget(min(self.max_in_flight - len(in_flight), self.batch_size * self.workers))
+            rows = []
+            if budget > 0:
+                try:
+                    rows = self.claim(budget)
+                except Exception as e:
+                    logging.error(f"Outbox claim failed: {e}")
+                for row in rows:
+                    future = self._submit(row)
+                    if future is not None:
+                        in_flight[future] = row
+
+            if not in_flight:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            # Return quickly to claim more while there is spare capacity
+            timeout = 0.05 if rows else min(0.5, self.poll_interval)
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                self._complete(in_flight.pop(future), future)
+
+    def _worker(self):
+        while True:
+            self._maybe_prune()
+            budget = self._claim_budget(self.batch_size)
+            if not budget:
+                time.sleep(0.1)
+                continue
+            try:
+                rows = self.claim(budget)
+            except Exception as e:
+                logging.error(f"Outbox claim failed: {e}")
+                rows = []
+
+            if not rows:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            for row in rows:
+                self.deliver(row)
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            pending = self.db.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+            if self.submit_fn:
+                thread = threading.Thread(target=self._async_worker, name='outbox-drain', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+                logging.info(f"Outbox started in async mode ({pending} messages pending)")
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'outbox-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logging.info(f"Outbox started with {self.workers} workers ({pending} messages pending)")
+
+    def stats(self):
+        rows = self.db.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def lane_stats(self):
+        """
+        Per-lane queue depth, and send latency (enqueue to sent) over the
+        last 1000 messages this process sent in each lane
+        """
+        rows = self.db.execute(
+            "SELECT lane, COUNT(*) AS n FROM outbox WHERE status IN ('pending', 'sending') GROUP BY lane"
+        ).fetchall()
+        waiting = {row['lane']: row['n'] for row in rows}
+        stats = {}
+        with self._stats_lock:
+            for lane, weight in self.lane_weights.items():
+                latencies = sorted(self._latencies[lane])
+                stats[lane] = {
+                    'weight': weight,
+                    'waiting': waiting.get(lane, 0),
+                    'sent': self._sent_counts[lane],
+                    'latency_p50': round(latencies[len(latencies) // 2], 3) if latencies else None,
+                    'latency_p95': round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+                    'latency_max': round(latencies[-1], 3) if latencies else None,
+                }
+        return stats
+
+    def job_stats(self, job_id):
+        """
+        Count a job's messages as queued (pending or sending), sent and failed
+        """
+        rows = self.db.execute(
+            "SELECT status, COUNT(*) AS n FROM outbox WHERE job_id = ? GROUP BY status", (job_id,)
+        ).fetchall()
+        counts = {row['status']: row['n'] for row in rows}
+        return {
+            'queued': counts.get('pending', 0) + counts.get('sending', 0),
+            'sent': counts.get('sent', 0),
+            'failed': counts.get('failed', 0),
+        }
@@ -0,0 +1,168 @@
+import time
+import queue
+import logging
+import threading
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    fn(item) returns the item to pass downstream, or None to drop it. With
+    batch_size set, fn receives a list of up to batch_size items (flushed at
+    least every flush_interval seconds) and returns a list to pass on.
+    """
+
+    def __init__(self, name, fn, workers=1, queue_size=16, batch_size=None, flush_interval=1.0):
+        if batch_size and workers != 1:
+            raise ValueError("batched stages run with a single worker")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+
+
+class Pipeline:
+    """
+    Chain of stages connected by bounded queues, each served by its own
+    worker threads. Items stream through as soon as a stage finishes with
+    them, and a full queue blocks the stage feeding it.
+    """
+
+    def __init__(self, stages, name='pipeline'):
+        self.stages = stages
+        self.name = name
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._remaining = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._threads = []
+        self._done = threading.Event()
+
+    def start(self):
+        for i, stage in enumerate(self.stages):
+            target = self._batch_worker if stage.batch_size else self._worker
+            for n in range(stage.workers):
+                thread = threading.Thread(target=target, args=(i,), name=f'{self.name}-{stage.name}-{n}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def put(self, item):
+        """
+        Feed an item into the first stage, blocking while its queue is full
+        """
+        self._queues[0].put(item)
+
+    def close(self):
+        """
+        Signal that no more items will be fed in
+        """
+        for _ in range(self.stages[0].workers):
+            self._queues[0].put(_DONE)
+
+    def join(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def run(self, items):
+        """
+        Start the pipeline, feed every item through it and wait for it to drain
+        """
+        self.start()
+        for item in items:
+            self.put(item)
+        self.close()
+        self.join()
+        return self
+
+    @property
+    def errors(self):
+        return sum(stage.errors for stage in self.stages)
+
+    def stats(self):
+        return {
+            stage.name: {'processed': stage.processed, 'dropped': stage.dropped, 'errors': stage.errors}
+            for stage in self.stages
+        }
+
+    def _emit(self, i, item):
+        if i + 1 < len(self.stages):
+            self._queues[i + 1].put(item)
+
+    def _finish_worker(self, i):
+        with self._lock:
+            self._remaining[i] -= 1
+            last = self._remaining[i] == 0
+        if not last:
+            return
+        if i + 1 < len(self.stages):
+            for _ in range(self.stages[i + 1].workers):
+                self._queues[i + 1].put(_DONE)
+        else:
+            self._done.set()
+
+    def _call(self, stage, arg):
+        try:
+            return stage.fn(arg)
+        except Exception as e:
+            with self._lock:
+                stage.errors += 1
+            logging.error(f"Pipeline stage {stage.name} failed: {e}")
+            return None
+
+    def _worker(self, i):
+        stage = self.stages[i]
+        in_queue = self._queues[i]
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                break
+            result = self._call(stage, item)
+            with self._lock:
+                stage.processed += 1
+                if result is None:
+                    stage.dropped += 1
+            if result is not None:
+                self._emit(i, result)
+        self._finish_worker(i)
+
+    def _batch_worker(self, i):
+        stage = self.stages[i]
+        in_queue = self._queues[i]
+        finished = False
+        while not finished:
+            batch = []
+            deadline = None
+            while len(batch) < stage.batch_size:
+                # Wait indefinitely for the first item, then at most flush_interval for the rest
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    item = in_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if deadline is None:
+                    deadline = time.monotonic() + stage.flush_interval
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                continue
+            results = self._call(stage, batch)
+            with self._lock:
+                stage.processed += len(batch)
+                if results is None:
+                    stage.dropped += len(batch)
+            if results is None:
+                continue
+            for result in results:
+                self._emit(i, result)
+        self._finish_worker(i)
@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import heapq
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+
+CRON_FIELDS = [
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 6),
+]
+
+
+class IntervalSpec:
+    """
+    Run every `seconds` seconds
+    """
+
+    def __init__(self, seconds):
+        if seconds <= 0:
+            raise ValueError("interval must be positive")
+        self.seconds = seconds
+
+    def next_after(self, moment):
+        return moment + timedelta(seconds=self.seconds)
+
+    def __str__(self):
+        return f'every {self.seconds}s'
+
+
+class CronSpec:
+    """
+    Standard 5-field cron expression: minute hour day-of-month month day-of-week.
+    Fields accept *, lists (1,15), ranges (1-5) and steps (*/10, 8-18/2);
+    day-of-week uses 0 or 7 for Sunday.
+    """
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.restricted = {}
+        for (name, low, high), part in zip(CRON_FIELDS, parts):
+            values = self._parse_field(part, low, high if name != 'weekday' else 7)
+            if name == 'weekday' and 7 in values:
+                values.discard(7)
+                values.add(0)
+            setattr(self, name, values)
+            self.restricted[name] = part != '*'
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for item in field.split(','):
+            base, _, step = item.partition('/')
+            step = int(step) if step else 1
+            if base == '*':
+                start, end = low, high
+            elif '-' in base:
+                start, end = (int(v) for v in base.split('-', 1))
+            else:
+                start = end = int(base)
+                if step > 1:
+                    end = high
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"invalid cron field {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.day
+        weekday_ok = (moment.isoweekday() % 7) in self.weekday
+        # Cron semantics: if both day fields are restricted, either may match
+        if self.restricted['day'] and self.restricted['weekday']:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment):
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.month:
+                year, month = candidate.year + (candidate.month == 12), candidate.month % 12 + 1
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hour:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minute:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"cron expression never matches: {self.expression!r}")
+
+    def __str__(self):
+        return self.expression
+
+
+def parse_spec(spec):
+    """
+    Turn a schedule spec into an object with next_after(datetime):
+    a number of seconds, 'every 6h' / 'every 30m' / 'every 45s',
+    'daily HH:MM', or a 5-field cron expression
+    """
+    if isinstance(spec, (IntervalSpec, CronSpec)):
+        return spec
+    if isinstance(spec, (int, float)):
+        return IntervalSpec(spec)
+
+    text = spec.strip()
+    if text.startswith('every '):
+        amount = text[6:].strip()
+        units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+        return IntervalSpec(float(amount[:-1]) * units[amount[-1]])
+    if text.startswith('daily '):
+        hour, minute = text[6:].strip().split(':')
+        return CronSpec(f'{int(minute)} {int(hour)} * * *')
+    return CronSpec(text)
+
+
+class Job:
+    def __init__(self, name, fn, spec, jitter=0, catch_up=True, run_at_start=False):
+        self.name = name
+        self.fn = fn
+        self.spec = parse_spec(spec)
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.run_at_start = run_at_start
+        self.next_run = None
+        self.last_run = None
+        self.last_duration = None
+        self.last_status = None
+        self.last_error = None
+        self.runs = 0
+        self.running = False
+
+    def status(self):
+        return {
+            'spec': str(self.spec),
+            'next_run': self.next_run.isoformat(timespec='seconds') if self.next_run else None,
+            'last_run': self.last_run.isoformat(timespec='seconds') if self.last_run else None,
+            'last_duration': round(self.last_duration, 3) if self.last_duration is not None else None,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'runs': self.runs,
+            'running': self.running,
+        }
+
+
+class Scheduler:
+    """
+    Single scheduler thread for all periodic jobs.
+
+    Jobs sit in a heap ordered by next run time and the thread sleeps until
+    the earliest one is due (or a job is added), so nothing polls. Last run
+    times are saved to state_path: on start, a job whose run was missed while
+    the process was down runs once straight away (catch-up). Each run happens
+    on its own thread and a job never overlaps with itself.
+    """
+
+    def __init__(self, state_path=None):
+        self.state_path = state_path
+        self.jobs = {}
+        self._heap = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._state = {}
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            return {}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        with self._cond:
+            state = {
+                name: job.last_run.isoformat() for name, job in self.jobs.items() if job.last_run
+            }
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def add_job(self, name, fn, spec, jitter=0, catch_up=True, run_at_start=False):
+        """
+        Register fn to run on spec (see parse_spec). jitter adds a random
+        delay of up to that many seconds to each run.
+        """
+        job = Job(name, fn, spec, jitter=jitter, catch_up=catch_up, run_at_start=run_at_start)
+        with self._cond:
+            self.jobs[name] = job
+            if self._thread:
+                self._schedule(job, datetime.now())
+                self._cond.notify()
+        return job
+
+    def _schedule(self, job, now):
+        """
+        Work out a job's first run from its last recorded run
+        """
+        saved = self._state.get(job.name)
+        if saved:
+            job.last_run = max(job.last_run or datetime.min, datetime.fromisoformat(saved))
+
+        if job.run_at_start:
+            due = now
+        elif job.catch_up and job.last_run and job.spec.next_after(job.last_run) <= now:
+            logging.info(f"Job {job.name} missed a run since {job.last_run:%Y-%m-%d %H:%M}; catching up")
+            due = now
+        else:
+            due = job.spec.next_after(now)
+        self._push(job, due)
+
+    def _push(self, job, due):
+        if job.jitter:
+            due += timedelta(seconds=random.uniform(0, job.jitter))
+        job.next_run = due
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, job))
+
+    def start(self):
+        """
+        Start the scheduler thread. State is reloaded first, so a scheduler
+        started after another process ran the jobs (e.g. on a leadership
+        change) continues from their last runs.
+        """
+        with self._cond:
+            if self._thread:
+                return
+            self._stopped = False
+            self._state = self._load_state()
+            self._heap = []
+            now = datetime.now()
+            for job in self.jobs.values():
+                self._schedule(job, now)
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+        logging.info(f"Scheduler started with {len(self.jobs)} jobs")
+
+    def stop(self):
+        """
+        Stop scheduling new runs; runs in progress finish on their own
+        """
+        with self._cond:
+            thread = self._thread
+            self._stopped = True
+            self._cond.notify()
+        if thread:
+            thread.join()
+        with self._cond:
+            self._thread = None
+            self._heap = []
+            for job in self.jobs.values():
+                job.next_run = None
+        logging.info("Scheduler stopped")
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._heap:
+                        wait = (self._heap[0][0] - datetime.now()).total_seconds()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if self._stopped:
+                    return
+                due, _, job = heapq.heappop(self._heap)
+                # Schedule from now, so a long sleep or suspend coalesces missed runs into one
+                self._push(job, job.spec.next_after(max(due, datetime.now())))
+                if job.running:
+                    logging.warning(f"Job {job.name} is still running; skipping this run")
+                    continue
+                job.running = True
+            threading.Thread(target=self._run, args=(job,), name=f'job-{job.name}', daemon=True).start()
+
+    def _run(self, job):
+        started = time.monotonic()
+        job.last_run = datetime.now()
+        try:
+            job.fn()
+            job.last_status = 'ok'
+            job.last_error = None
+        except Exception as e:
+            job.last_status = 'error'
+            job.last_error = str(e)
+            logging.error(f"Job {job.name} failed: {e}")
+        finally:
+            job.last_duration = time.monotonic() - started
+            job.runs += 1
+            job.running = False
+        logging.info(f"Job {job.name} finished in {job.last_duration:.2f}s ({job.last_status})")
+        try:
+            self._save_state()
+        except OSError as e:
+            logging.error(f"Could not save scheduler state: {e}")
+
+    def run_now(self, name):
+        """
+        Run a job immediately on its own thread, outside its schedule
+        """
+        job = self.jobs[name]
+        with self._cond:
+            if job.running:
+                return False
+            job.running = True
+        threading.Thread(target=self._run, args=(job,), name=f'job-{job.name}', daemon=True).start()
+        return True
+
+    def status(self):
+        with self._cond:
+            return {name: job.status() for name, job in self.jobs.items()}
@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+FEED_URL = "https://agriwelfare.gov.in/en/getRecent?vacancy_type=Y"
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the shared HTTP session used for scraping, so connections (and
+    TLS handshakes) are reused between runs
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            retry = Retry(total=3, backoff_factor=1, status_forcelist=[502, 503, 504], allowed_methods=None)
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=retry)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def notice_id_for(item):
+    """
+    Return the feed id of a notice, falling back to a stable hash of its title
+    """
+    notice_id = str(item.get('Id', '') or '')
+    if notice_id:
+        return notice_id
+    return hashlib.sha1(item.get('Title', '').encode('utf-8')).hexdigest()[:16]
+
+
+def fetch_feed(state, url=FEED_URL, session=None, timeout=30):
+    """
+    Fetch the recent-notices feed, skipping work when it hasn't changed.
+
+    Sends If-None-Match / If-Modified-Since from the previous run's state and
+    compares a hash of the body before parsing, so an unchanged feed costs one
+    round trip and no JSON parsing.
+    Returns (notices, new_state); notices is None if the feed is unchanged or
+    could not be fetched.
+    """
+    session = session or get_session()
+    headers = {}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+
+    try:
+        response = session.post(url, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        logging.error(f"Failed to fetch notices feed: {e}")
+        return None, state
+
+    if response.status_code == 304:
+        logging.info("Notices feed not modified")
+        return None, state
+
+    if response.status_code != 200:
+        logging.error(f"Failed to fetch notices via AJAX: {response.status_code}")
+        return None, state
+
+    new_state = dict(state)
+    new_state['etag'] = response.headers.get('ETag', '')
+    new_state['last_modified'] = response.headers.get('Last-Modified', '')
+    new_state['content_hash'] = hashlib.sha256(response.content).hexdigest()
+
+    if new_state['content_hash'] == state.get('content_hash'):
+        logging.info("Notices feed content unchanged")
+        return None, new_state
+
+    try:
+        notices_data = response.json()
+    except ValueError as e:
+        logging.error(f"Failed to parse AJAX response as JSON: {e}")
+        logging.debug(f"Response content: {response.text[:500]}")
+        return None, state
+
+    if not isinstance(notices_data, dict) or 'data' not in notices_data:
+        logging.error("No data found in AJAX response")
+        logging.debug(f"Response content: {response.text[:500]}")
+        return None, state
+
+    return notices_data['data'], new_state
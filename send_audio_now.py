@@ -1,9 +1,10 @@
 import os
-import json
 import logging
-from twilio.rest import Client
 from dotenv import load_dotenv
-import time
+from db import Database
+from outbox import Outbox
+from farmer_store import FarmerStore
+from audio_catalog import AudioCatalog
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,50 +12,30 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Load environment variables
 load_dotenv()
 
-# Twilio credentials
-account_sid = os.environ.get('TWILIO_ACCOUNT_SID', '')
-auth_token = os.environ.get('TWILIO_AUTH_TOKEN', '')
-whatsapp_number = os.environ.get('TWILIO_WHATSAPP_NUMBER', 'whatsapp:+14155238886')
 
 # Ngrok URL for audio files
 ngrok_audio_url = "https://6a4f-2409-40d0-12e7-b690-ad0d-cc77-f41e-13cf.ngrok-free.app/audio"
 
-# Initialize Twilio client
-try:
-    client = Client(account_sid, auth_token)
-    logging.info("Twilio client initialized successfully")
-except Exception as e:
-    logging.error(f"Twilio client initialization failed: {e}")
-    client = None
+# Messages are queued in the app's outbox, so its workers deliver them (with retries)
+# under the same Twilio rate limit as everything else the app sends
+db = Database(os.environ.get('DATABASE_PATH', 'agrivoice.db'))
+outbox = Outbox(db, send_fn=None)
 
 def send_whatsapp_message(phone_number, message_body, media_url=None):
     """
-    Send a WhatsApp message to a specific phone number
-    Returns True if successful, False otherwise
+    Queue a WhatsApp message to a specific phone number in the app's outbox
+    Returns True if queued, False otherwise
     """
-    if not client:
-        logging.warning(f"Skipping WhatsApp message to {phone_number} - Twilio client not initialized")
-        return False
-    
     try:
         # Format the phone number correctly for WhatsApp
         if not phone_number.startswith('whatsapp:'):
             phone_number = f'whatsapp:{phone_number}'
         
-        message_params = {
-            'from_': whatsapp_number,
-            'body': message_body,
-            'to': phone_number
-        }
-        
-        if media_url:
-            message_params['media_url'] = media_url
-            
-        message = client.messages.create(**message_params)
-        logging.info(f"Sent WhatsApp message to {phone_number}: SID {message.sid}")
+        message_id = outbox.enqueue(phone_number, message_body, media_url, lane='manual')
+        logging.info(f"Queued WhatsApp message {message_id} to {phone_number}")
         return True
     except Exception as e:
-        logging.error(f"Failed to send WhatsApp message to {phone_number}: {e}")
+        logging.error(f"Failed to queue WhatsApp message to {phone_number}: {e}")
         return False
 
 def send_audio_files():
@@ -65,22 +46,10 @@ def send_audio_files():
     upload_folder = 'static/audio/'
     farmers_file = 'farmers.json'
     
-    # Get all audio files from static/audio directory
-    audio_files = []
-    for file in os.listdir(upload_folder):
-        if file.endswith('.mp3'):
-            file_path = os.path.join(upload_folder, file)
-            audio_files.append({
-                'filename': file,
-                'path': file_path,
-                'created': os.path.getctime(file_path)
-            })
-    
-    # Sort by creation time (newest first)
-    audio_files.sort(key=lambda x: x['created'], reverse=True)
-    
-    # Get the 3 most recent files
-    recent_files = audio_files[:3]
+    # Get the 3 most recent files from the audio catalog
+    audio_catalog = AudioCatalog(db, upload_folder)
+    audio_catalog.backfill()
+    recent_files = audio_catalog.recent(3, kind='notice')
     
     if not recent_files:
         logging.warning("No audio files found to send")
@@ -90,9 +59,10 @@ def send_audio_files():
     for audio in recent_files:
         logging.info(f"- {audio['filename']}")
     
-    # Get all farmers
-    with open(farmers_file, 'r') as f:
-        farmers = json.load(f)
+    # Get all farmers (importing farmers.json first if it was never migrated)
+    farmer_store = FarmerStore(db)
+    farmer_store.migrate_from_json(farmers_file)
+    farmers = list(farmer_store.iter_all())
     
     if not farmers:
         logging.warning("No farmers registered to send audio files to")
@@ -123,10 +93,8 @@ def send_audio_files():
                 logging.info(f"Successfully sent audio file {i+1} to {phone}")
             else:
                 logging.error(f"Failed to send audio file {i+1} to {phone}")
-            time.sleep(3)  # Delay between messages
         
         logging.info(f"Sent {len(recent_files)} audio files to {name} at {phone}")
-        time.sleep(2)  # Delay between farmers
     
     logging.info(f"Finished sending audio files to {len(farmers)} farmers")
 
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from broadcast import BroadcastEngine
+from broadcast_runs import BroadcastRuns
+from farmer_store import FarmerStore
+
+
+def wait_for(runs, run_id, statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        run = runs.get(run_id)
+        if run['status'] in statuses:
+            return run
+        time.sleep(0.01)
+    raise AssertionError(f"run {run_id} still {runs.get(run_id)['status']}")
+
+
+@pytest.fixture
+def farmers(db):
+    store = FarmerStore(db)
+    for i in range(1, 6):
+        store.add(f'Farmer {i}', f'+91000000000{i}', 'Patna')
+    return store
+
+
+def test_run_checkpoints_every_recipient(db, farmers):
+    runs = BroadcastRuns(db, farmers, BroadcastEngine(workers=2), batch_size=2)
+    runs.register('test', lambda farmer, params: farmer['id'] != 3)
+
+    run = wait_for(runs, runs.start('test', {}), {'done', 'failed'})
+
+    assert run['status'] == 'done'
+    assert (run['total'], run['processed'], run['failed']) == (5, 5, 1)
+    assert [failure['phone'] for failure in run['recent_failures']] == ['+910000000003']
+    outcomes = db.execute("SELECT farmer_id, outcome FROM broadcast_recipients ORDER BY farmer_id").fetchall()
+    assert [tuple(row) for row in outcomes] == [(1, 'queued'), (2, 'queued'), (3, 'failed'), (4, 'queued'), (5, 'queued')]
+
+
+def test_stale_run_resumes_after_last_checkpoint(db, farmers):
+    first = BroadcastRuns(db, farmers, BroadcastEngine(workers=1), batch_size=2)
+    served = []
+    run_ids = []
+
+    def pause_after_first_batch(farmer, params):
+        served.append(farmer['id'])
+        if farmer['id'] == 2:
+            first.pause(run_ids[0])
+
+    first.register('test', pause_after_first_batch)
+    run_ids.append(first.start('test', {}))
+    run = wait_for(first, run_ids[0], {'paused'})
+    # The pause lands at the batch boundary, so batch one is checkpointed
+    assert run['processed'] == 2
+
+    # The owner dies mid-run: another process takes over once its heartbeat is stale
+    db.execute("UPDATE broadcast_runs SET status = 'running', claimed_by = 'dead', heartbeat_at = 0")
+    second = BroadcastRuns(db, farmers, BroadcastEngine(workers=1), batch_size=2)
+    resumed = []
+    second.register('test', lambda farmer, params: resumed.append(farmer['id']))
+
+    assert second.resume_stale() == 1
+    run = wait_for(second, run_ids[0], {'done', 'failed'})
+
+    assert run['status'] == 'done'
+    assert served == [1, 2]
+    assert resumed == [3, 4, 5]
+    assert run['processed'] == 5
+
+
+def test_farmers_registered_after_start_are_not_included(db, farmers):
+    runs = BroadcastRuns(db, farmers, BroadcastEngine(workers=1), batch_size=10)
+    served = []
+    runs.register('test', lambda farmer, params: served.append(farmer['phone']))
+    run_id = runs.start('test', {})
+    farmers.add('Late', '+919999999999', 'Gaya')
+
+    assert wait_for(runs, run_id, {'done'})['total'] == 5
+    assert '+919999999999' not in served
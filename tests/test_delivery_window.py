@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+from delivery_window import DeliveryWindow, parse_range
+
+
+def at(hour, minute=0, day=15):
+    return datetime(2026, 3, day, hour, minute).timestamp()
+
+
+def test_parse_range():
+    assert parse_range('21:00-07:00') == ((21, 0), (7, 0))
+    assert parse_range('') is None
+    with pytest.raises(ValueError):
+        parse_range('09:00-09:00')
+
+
+def test_bounds_inside_and_before_window():
+    window = DeliveryWindow('09:00-11:00')
+    assert window.bounds(at(10)) == (at(10), at(11))
+    assert window.bounds(at(8)) == (at(9), at(11))
+    assert window.bounds(at(12)) == (at(9, day=16), at(11, day=16))
+
+
+def test_slot_is_stable_and_within_bounds():
+    window = DeliveryWindow('09:00-11:00')
+    bounds = (at(9), at(11))
+    slots = [window.slot(f'+9100000{i:04d}', bounds) for i in range(500)]
+    assert slots[:10] == [window.slot(f'+9100000{i:04d}', bounds) for i in range(10)]
+    assert all(at(9) <= slot < at(11) for slot in slots)
+    # Spread evenly: every 15-minute bucket of the window gets some farmers
+    buckets = {int((slot - at(9)) // 900) for slot in slots}
+    assert buckets == set(range(8))
+
+
+def test_after_quiet_without_key_moves_to_end_of_quiet_hours():
+    window = DeliveryWindow('', '21:00-07:00')
+    assert window.after_quiet(at(23)) == at(7, day=16)
+    assert window.after_quiet(at(3)) == at(7)
+    assert window.after_quiet(at(12)) == at(12)
+
+
+def test_after_quiet_spreads_keys_after_quiet_hours():
+    window = DeliveryWindow('09:00-11:00', '21:00-07:00')
+    times = [window.after_quiet(at(23), key=f'farmer-{i}') for i in range(200)]
+    assert all(at(7, day=16) <= when < at(9, day=16) for when in times)
+    assert len({int((when - at(7, day=16)) // 1800) for when in times}) == 4
+    assert window.after_quiet(at(23), key='farmer-1') == times[1]
+
+
+def test_delay_counts_quiet_hours():
+    window = DeliveryWindow('', '21:00-07:00')
+    assert window.delay(now=at(23)) == 8 * 3600
+    assert window.delay(now=at(12)) == 0
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from gazetteer import Gazetteer
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    path = tmp_path / 'gazetteer.json'
+    path.write_text(json.dumps({
+        'districts': {'Patna': 'Bihar', 'Gaya': 'Bihar', 'Pune': 'Maharashtra', 'Mandi': 'Himachal Pradesh'},
+        'aliases': {'पटना': 'Patna', 'Kisan': 'Nowhere'},
+        'crops': {'arhar': 'pulses'},
+    }), encoding='utf-8')
+    return Gazetteer(str(path))
+
+
+def test_tag_districts_states_and_crops(gazetteer):
+    tags = gazetteer.tag('पटना में गेहूं की खरीद, Uttar Pradesh arhar prices')
+    assert tags == {
+        'districts': ['Patna'],
+        'states': ['Uttar Pradesh'],
+        'crops': ['pulses', 'wheat'],
+        'national': False,
+    }
+
+
+def test_tag_without_places_is_national(gazetteer):
+    assert gazetteer.tag('Wheat MSP announced')['national'] is True
+
+
+def test_tag_national_phrase_wins(gazetteer):
+    tags = gazetteer.tag('Nationwide advisory, including Patna')
+    assert tags['national'] is True
+    assert gazetteer.target_districts(tags) is None
+
+
+def test_alias_to_unknown_district_is_not_a_term(gazetteer):
+    assert gazetteer.tag('Kisan samman nidhi update')['national'] is True
+
+
+def test_target_districts_expands_states(gazetteer):
+    assert gazetteer.target_districts(gazetteer.tag('Bihar flood relief')) == ['Gaya', 'Patna']
+    assert gazetteer.target_districts(gazetteer.tag('Pune and Gaya market rates')) == ['Gaya', 'Pune']
+
+
+def test_target_districts_state_without_district_map_goes_everywhere(gazetteer):
+    assert gazetteer.target_districts(gazetteer.tag('Punjab procurement')) is None
+    assert gazetteer.target_districts(gazetteer.tag('Punjab and Patna procurement')) == ['Patna']
+
+
+def test_untagged_notice_goes_everywhere(gazetteer):
+    assert gazetteer.target_districts(None) is None
+
+
+def test_ambiguous_term_is_ignored(tmp_path):
+    path = tmp_path / 'gazetteer.json'
+    # A district named like a crop could be either, so it narrows nothing
+    path.write_text(json.dumps({'districts': {'Onion': 'Bihar'}}), encoding='utf-8')
+    tags = Gazetteer(str(path)).tag('Onion prices fall')
+    assert tags['districts'] == [] and tags['crops'] == []
+    assert tags['national'] is True
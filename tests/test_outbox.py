@@ -0,0 +1,148 @@
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import pytest
+
+from async_dispatch import TwilioHTTPError
+from outbox import Outbox, is_retryable
+from rate_limiter import TokenBucket
+
+
+def make_outbox(db, send_fn=None, **kwargs):
+    return Outbox(db, send_fn or (lambda to, body, media_url: f'SID-{to}'), **kwargs)
+
+
+def row(db, row_id):
+    return db.execute("SELECT * FROM outbox WHERE id = ?", (row_id,)).fetchone()
+
+
+def test_claim_shares_capacity_by_lane_weight(db):
+    outbox = make_outbox(db)
+    for lane in ('bulk', 'manual', 'interactive'):
+        for i in range(30):
+            outbox.enqueue(f'+91{lane}{i}', 'hello', lane=lane)
+
+    claimed = Counter(r['lane'] for r in outbox.claim(14))
+    assert claimed == {'interactive': 10, 'manual': 3, 'bulk': 1}
+
+    # Credits carry over, so small claims add up to the same shares
+    claimed = Counter(r['lane'] for _ in range(14) for r in outbox.claim(1))
+    assert claimed == {'interactive': 10, 'manual': 3, 'bulk': 1}
+
+
+def test_idle_lanes_leave_capacity_to_busy_ones(db):
+    outbox = make_outbox(db)
+    for i in range(10):
+        outbox.enqueue(f'+91{i}', 'hello', lane='bulk')
+    assert len(outbox.claim(10)) == 10
+
+
+def test_unknown_lane_is_rejected(db):
+    with pytest.raises(ValueError):
+        make_outbox(db).enqueue('+91', 'hello', lane='urgent')
+
+
+def test_delayed_rows_are_not_claimed_early(db):
+    outbox = make_outbox(db)
+    outbox.enqueue('+91', 'later', delay=60)
+    assert outbox.claim(10) == []
+
+
+def test_transient_failure_is_retried_with_backoff(db):
+    def fail(to, body, media_url):
+        raise TwilioHTTPError(503, 'unavailable')
+
+    outbox = make_outbox(db, fail, base_delay=5)
+    row_id = outbox.enqueue('+91', 'hello')
+    before = time.time()
+
+    assert outbox.deliver(outbox.claim(1)[0]) is False
+
+    failed = row(db, row_id)
+    assert (failed['status'], failed['attempts'], failed['claimed_by']) == ('pending', 1, None)
+    assert failed['next_attempt_at'] >= before + 5
+    assert 'HTTP 503' in failed['last_error']
+
+
+def test_permanent_failure_and_exhausted_retries_give_up(db):
+    given_up = []
+
+    def fail(to, body, media_url):
+        raise TwilioHTTPError(400 if to == '+91bad' else 500, 'nope')
+
+    outbox = make_outbox(db, fail, max_attempts=2, base_delay=0,
+                         on_failed=lambda r, error: given_up.append(r['to_number']))
+    bad = outbox.enqueue('+91bad', 'hello')
+    flaky = outbox.enqueue('+91flaky', 'hello')
+
+    for r in outbox.claim(2):
+        outbox.deliver(r)
+    assert row(db, bad)['status'] == 'failed'
+    assert row(db, flaky)['status'] == 'pending'
+
+    outbox.deliver(outbox.claim(1)[0])
+    assert row(db, flaky)['status'] == 'failed'
+    assert given_up == ['+91bad', '+91flaky']
+
+
+def test_is_retryable():
+    assert is_retryable(TwilioHTTPError(429, 'slow down'))
+    assert is_retryable(TwilioHTTPError(502, 'bad gateway'))
+    assert is_retryable(ConnectionError('reset'))
+    assert not is_retryable(TwilioHTTPError(404, 'no such number'))
+
+
+def test_sending_rows_of_a_dead_process_are_reclaimed(db):
+    outbox = make_outbox(db, claim_timeout=300)
+    row_id = outbox.enqueue('+91', 'hello')
+    outbox.claim(1)
+    assert outbox.claim(1) == []
+
+    db.execute("UPDATE outbox SET claimed_at = ? WHERE id = ?", (time.time() - 301, row_id))
+    assert [r['id'] for r in outbox.claim(1)] == [row_id]
+
+
+def test_claim_budget_follows_rate_limiter_backlog(db):
+    limiter = TokenBucket(rate=10, burst=1)
+    outbox = make_outbox(db, rate_limiter=limiter, max_backlog=2)
+    assert outbox._claim_budget(100) == 20
+    limiter.reserve(25)
+    assert outbox._claim_budget(100) == 0
+
+
+def test_async_drain_survives_submit_errors(db):
+    sent = []
+
+    def submit(to, body, media_url):
+        if to == '+91broken':
+            raise RuntimeError('dispatcher stopped')
+        future = Future()
+        future.set_result(f'SID-{to}')
+        return future
+
+    outbox = make_outbox(db, submit_fn=submit, poll_interval=0.05, base_delay=60,
+                         on_sent=lambda r, sid: sent.append(sid))
+    broken = outbox.enqueue('+91broken', 'hello')
+    outbox.start()
+    outbox.enqueue('+91ok', 'hello')
+
+    deadline = time.monotonic() + 5
+    while not sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert sent == ['SID-+91ok']
+    assert row(db, broken)['status'] == 'pending'
+    assert row(db, broken)['last_error'] == 'dispatcher stopped'
+
+
+def test_prune_removes_only_old_finished_rows(db):
+    outbox = make_outbox(db, retention=3600)
+    old_sent, new_sent, old_pending = (outbox.enqueue(f'+91{i}', 'hello') for i in range(3))
+    outbox.mark_sent(old_sent, 'SID1')
+    outbox.mark_sent(new_sent, 'SID2')
+    db.execute("UPDATE outbox SET updated_at = 0 WHERE id IN (?, ?)", (old_sent, old_pending))
+
+    assert outbox.prune() == 1
+    assert row(db, old_sent) is None
+    assert row(db, new_sent) is not None and row(db, old_pending) is not None
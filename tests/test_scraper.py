@@ -0,0 +1,79 @@
+import json
+
+import requests
+
+from scraper import fetch_feed, notice_id_for
+
+FEED = {'data': [{'Id': 7, 'Title': 'गेहूं खरीद'}]}
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.text = body.decode('utf-8')
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def post(self, url, headers=None, timeout=None):
+        self.requests.append(headers)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def feed_response(feed=FEED, etag='"v1"'):
+    return FakeResponse(200, json.dumps(feed).encode('utf-8'),
+                        {'ETag': etag, 'Last-Modified': 'Sun, 18 Oct 2026 06:00:00 GMT'})
+
+
+def test_first_fetch_parses_and_records_validators():
+    session = FakeSession(feed_response())
+    notices, state = fetch_feed({}, session=session)
+    assert notices == FEED['data']
+    assert state['etag'] == '"v1"'
+    assert state['last_modified'] == 'Sun, 18 Oct 2026 06:00:00 GMT'
+    assert session.requests == [{}]
+
+
+def test_not_modified_sends_validators_and_keeps_state():
+    _, state = fetch_feed({}, session=FakeSession(feed_response()))
+    session = FakeSession(FakeResponse(304))
+
+    notices, new_state = fetch_feed(state, session=session)
+
+    assert notices is None
+    assert new_state == state
+    assert session.requests == [{
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Sun, 18 Oct 2026 06:00:00 GMT',
+    }]
+
+
+def test_unchanged_body_is_not_parsed_again():
+    _, state = fetch_feed({}, session=FakeSession(feed_response()))
+    notices, new_state = fetch_feed(state, session=FakeSession(feed_response(etag='"v2"')))
+    assert notices is None
+    assert new_state['etag'] == '"v2"'
+
+
+def test_errors_keep_previous_state():
+    state = {'etag': '"v1"', 'content_hash': 'abc'}
+    assert fetch_feed(state, session=FakeSession(FakeResponse(503))) == (None, state)
+    assert fetch_feed(state, session=FakeSession(requests.ConnectionError('down'))) == (None, state)
+    assert fetch_feed(state, session=FakeSession(FakeResponse(200, b'<html>'))) == (None, state)
+
+
+def test_notice_id_falls_back_to_title_hash():
+    assert notice_id_for({'Id': 7, 'Title': 'x'}) == '7'
+    assert notice_id_for({'Title': 'x'}) == notice_id_for({'Id': '', 'Title': 'x'})
+    assert len(notice_id_for({'Title': 'x'})) == 16
@@ -0,0 +1,74 @@
+import os
+
+import mp3
+from tts_backends import FakeBackend
+from tts_cache import TTSCache, split_text
+
+FRAME = FakeBackend.FRAME
+
+
+def test_split_text_one_chunk_per_sentence():
+    assert split_text('पहला वाक्य। दूसरा वाक्य! Third one? Last.') == [
+        'पहला वाक्य।', 'दूसरा वाक्य!', 'Third one?', 'Last.'
+    ]
+
+
+def test_split_text_shared_sentence_gives_same_chunk():
+    boilerplate = 'नमस्ते किसान भाइयों।'
+    first = split_text(f'{boilerplate} गेहूं की बुवाई शुरू करें।')
+    second = split_text(f'{boilerplate} धान की कटाई पूरी करें।')
+    assert first[0] == second[0] == boilerplate
+
+
+def test_split_text_long_sentence_at_phrases_then_spaces():
+    sentence = 'alpha beta, ' + ' '.join(['word'] * 30) + '.'
+    chunks = split_text(sentence, max_chars=40)
+    assert chunks[0] == 'alpha beta,'
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert ' '.join(chunks) == sentence
+
+
+def test_split_text_empty():
+    assert split_text('   ') == []
+
+
+def test_concat_joins_frames_and_drops_tags(tmp_path):
+    first = tmp_path / 'a.mp3'
+    second = tmp_path / 'b.mp3'
+    # ID3v2 tag (10-byte header, 5-byte body) before two frames; ID3v1 tag after one frame
+    first.write_bytes(b'ID3\x03\x00\x00\x00\x00\x00\x05' + b'x' * 5 + FRAME * 2)
+    second.write_bytes(FRAME + b'TAG' + bytes(125))
+    out = tmp_path / 'out.mp3'
+
+    mp3.concat([str(first), str(second)], str(out))
+
+    assert out.read_bytes() == FRAME * 3
+    assert abs(mp3.duration(str(out)) - 3 * 0.024) < 1e-9
+
+
+def test_cache_reuses_sentence_chunks(tmp_path):
+    backend = FakeBackend()
+    calls = []
+    synthesize = backend.synthesize
+    backend.synthesize = lambda text, *args, **kwargs: calls.append(text) or synthesize(text, *args, **kwargs)
+    cache = TTSCache(str(tmp_path), backend=backend)
+
+    cache.get_or_create('नमस्ते। पहली सूचना।')
+    cache.get_or_create('नमस्ते। दूसरी सूचना।')
+
+    assert calls.count('नमस्ते।') == 1
+    assert sorted(calls) == sorted(['नमस्ते।', 'पहली सूचना।', 'दूसरी सूचना।'])
+
+
+def test_failed_synthesis_releases_key_lock(tmp_path):
+    class Failing(FakeBackend):
+        def synthesize(self, *args, **kwargs):
+            raise RuntimeError('backend down')
+
+    cache = TTSCache(str(tmp_path), backend=Failing())
+    try:
+        cache.get_or_create('एक वाक्य')
+    except RuntimeError:
+        pass
+    assert cache._locks == {}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.mp3')]
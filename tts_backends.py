@@ -0,0 +1,110 @@
+import time
+import shutil
+import subprocess
+
+try:
+    from gtts import gTTS
+except ImportError:
+    gTTS = None
+
+
+class TTSBackend:
+    """
+    Interface for speech synthesis engines. synthesize() writes an MP3 of
+    text spoken in lang to path. name identifies the engine (and its voice
+    settings) in TTS cache keys, so switching backend never reuses audio
+    produced by another one.
+    """
+
+    name = 'base'
+
+    def synthesize(self, text, lang, path, slow=False, tld='com'):
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """
+    Google Translate TTS over the network (the original engine)
+    """
+
+    name = 'gtts'
+
+    def __init__(self):
+        if gTTS is None:
+            raise RuntimeError("gTTS is not installed")
+
+    def synthesize(self, text, lang, path, slow=False, tld='com'):
+        gTTS(text=text, lang=lang, slow=slow, tld=tld).save(path)
+
+
+class EspeakBackend(TTSBackend):
+    """
+    Offline synthesis with espeak-ng, encoded to MP3 with lame or ffmpeg
+    """
+
+    def __init__(self, speed=150, pitch=50, bitrate='32k'):
+        self.espeak = shutil.which('espeak-ng') or shutil.which('espeak')
+        if not self.espeak:
+            raise RuntimeError("espeak-ng is not installed")
+        self.lame = shutil.which('lame')
+        self.ffmpeg = shutil.which('ffmpeg')
+        if not (self.lame or self.ffmpeg):
+            raise RuntimeError("lame or ffmpeg is required to encode espeak output as MP3")
+        self.speed = speed
+        self.pitch = pitch
+        self.bitrate = bitrate
+        self.name = f'espeak-s{speed}-p{pitch}'
+
+    def synthesize(self, text, lang, path, slow=False, tld='com'):
+        speed = int(self.speed * 0.7) if slow else self.speed
+        wav = subprocess.run(
+            [self.espeak, '-v', lang, '-s', str(speed), '-p', str(self.pitch), '--stdout', text],
+            check=True, capture_output=True
+        ).stdout
+
+        if self.lame:
+            command = [self.lame, '--quiet', '-b', self.bitrate.rstrip('k'), '-', path]
+        else:
+            command = [self.ffmpeg, '-loglevel', 'error', '-y', '-f', 'wav', '-i', 'pipe:0',
+                       '-codec:a', 'libmp3lame', '-b:a', self.bitrate, '-ac', '1', path]
+        subprocess.run(command, input=wav, check=True, capture_output=True)
+
+
+class FakeBackend(TTSBackend):
+    """
+    Deterministic offline backend for tests and benchmarks. Writes silent
+    MPEG-2 Layer III frames (24 kHz, 32 kbps, 24 ms each), a few per
+    character, after an optional simulated latency.
+    """
+
+    name = 'fake'
+    FRAME = bytes([0xFF, 0xF3, 0x44, 0xC0]) + bytes(92)
+
+    def __init__(self, latency=0.0, frames_per_char=3):
+        self.latency = latency
+        self.frames_per_char = frames_per_char
+
+    def synthesize(self, text, lang, path, slow=False, tld='com'):
+        if self.latency:
+            time.sleep(self.latency)
+        frames = max(1, len(text)) * self.frames_per_char * (2 if slow else 1)
+        with open(path, 'wb') as f:
+            f.write(self.FRAME * frames)
+
+
+BACKENDS = {
+    'gtts': GTTSBackend,
+    'espeak': EspeakBackend,
+    'fake': FakeBackend,
+}
+
+
+def get_backend(name='gtts', **options):
+    """
+    Create the TTS backend configured for this deployment
+    """
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown TTS backend: {name} (choose from {', '.join(BACKENDS)})")
+    return backend_class(**options)
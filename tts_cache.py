@@ -0,0 +1,281 @@
+import os
+import re
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import mp3
+from tts_backends import GTTSBackend
+
+SENTENCE_END = re.compile(r'(?<=[।॥.!?\n])\s+')
+PHRASE_END = re.compile(r'(?<=[,;:])\s+|\s+(?=-\s)')
+
+
+def _pack(pieces, max_chars, separator=' '):
+    # Greedily join pieces into chunks of at most max_chars
+    chunks = []
+    current = ''
+    for piece in pieces:
+        candidate = f'{current}{separator}{piece}' if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text, max_chars=200):
+    """
+    Split text into one chunk per sentence. Sentences longer than max_chars
+    are split at phrase boundaries, then at spaces. Chunks never depend on
+    their neighbours, so a sentence shared by two texts is the same chunk.
+    """
+    text = text.strip()
+    if not text:
+        return []
+
+    pieces = []
+    for sentence in SENTENCE_END.split(text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for phrase in PHRASE_END.split(sentence):
+            if len(phrase) <= max_chars:
+                pieces.append(phrase)
+            else:
+                pieces.extend(_pack(phrase.split(), max_chars))
+    return [piece for piece in pieces if piece.strip()]
+
+
+class TTSCache:
+    """
+    Content-addressed store of synthesized MP3s.
+
+    Each (text, language, voice settings, backend) combination is synthesized
+    once and saved as tts_<hash>.mp3 inside the audio folder, so the same
+    notice sent to many farmers (or in a later broadcast) reuses the same file.
+
+    Texts of several sentences are split into one chunk per sentence (long
+    sentences at phrase boundaries, up to chunk_chars); the chunks are
+    synthesized concurrently, each cached on its own so shared sentences
+    such as boilerplate are never re-synthesized, and their MP3 frames joined.
+
+    Eviction runs after evict_bytes of new entries or evict_interval seconds,
+    not on every miss, and never removes entries used within min_age, so
+    chunks about to be joined and files still waiting in the outbox stay put.
+    """
+
+    PREFIX = 'tts_'
+
+    def __init__(self, cache_dir, max_bytes=500 * 1024 * 1024, max_age=30 * 24 * 3600,
+                 backend=None, on_create=None, on_evict=None, chunk_chars=200, chunk_workers=4,
+                 chunk_attempts=2, min_age=2 * 24 * 3600, evict_interval=600, evict_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_age = min_age
+        self.evict_interval = evict_interval
+        self.evict_bytes = evict_bytes if evict_bytes is not None else max_bytes // 20
+        self._bytes_since_evict = 0
+        self._last_evict = time.monotonic()
+        self.backend = backend or GTTSBackend()
+        self.chunk_chars = chunk_chars
+        self.chunk_attempts = chunk_attempts
+        self._chunk_executor = ThreadPoolExecutor(max_workers=chunk_workers, thread_name_prefix='tts-chunk')
+        # Optional callbacks taking the filename, e.g. to keep the audio catalog in sync
+        self.on_create = on_create
+        self.on_evict = on_evict
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.synthesis_seconds = 0.0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_key(self, text, lang='hi', slow=False, tld='com'):
+        """
+        Return the hex digest identifying a (text, language, voice settings, backend) combination
+        """
+        payload = '\x1f'.join([text.strip(), lang, 'slow' if slow else 'normal', tld, self.backend.name])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def filename_for(self, key):
+        return f'{self.PREFIX}{key[:32]}.mp3'
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def get_or_create(self, text, lang='hi', slow=False, tld='com', chunked=True):
+        """
+        Return the filename of the cached MP3 for text, synthesizing it on a miss.
+        Concurrent callers asking for the same text wait for a single synthesis.
+        """
+        return self._get_or_create(text, lang, slow, tld, chunked=chunked, notify=True)
+
+    def _get_or_create(self, text, lang, slow, tld, chunked, notify):
+        key = self.cache_key(text, lang, slow, tld)
+        filename = self.filename_for(key)
+        path = os.path.join(self.cache_dir, filename)
+
+        if os.path.exists(path):
+            self._touch(path)
+            self._count_hit()
+            return filename
+
+        with self._lock_for(key):
+            if os.path.exists(path):
+                self._touch(path)
+                self._count_hit()
+                return filename
+
+            # Write to a temp file first so readers never see a partial MP3
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            started = time.monotonic()
+            try:
+                self._synthesize(text, lang, tmp_path, slow, tld, chunked)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._locks_guard:
+                    self._locks.pop(key, None)
+            elapsed = time.monotonic() - started
+
+        with self._stats_lock:
+            self.misses += 1
+            self.synthesis_seconds += elapsed
+            self._bytes_since_evict += os.path.getsize(path)
+
+        logging.info(f"Synthesized TTS cache entry {filename} with {self.backend.name} in {elapsed:.2f}s ({len(text)} chars, lang={lang})")
+        # Chunk entries are only building blocks, never reported as audio of their own
+        if notify and self.on_create:
+            self.on_create(filename)
+        self._maybe_evict()
+        return filename
+
+    def _synthesize(self, text, lang, path, slow, tld, chunked):
+        chunks = split_text(text, self.chunk_chars) if chunked else [text]
+        if len(chunks) <= 1:
+            self.backend.synthesize(text, lang, path, slow=slow, tld=tld)
+            return
+
+        filenames = list(self._chunk_executor.map(
+            lambda chunk: self._get_chunk(chunk, lang, slow, tld), chunks
+        ))
+        mp3.concat([os.path.join(self.cache_dir, filename) for filename in filenames], path)
+
+    def _get_chunk(self, chunk, lang, slow, tld):
+        # Retry each chunk on its own so one transient failure doesn't lose the whole clip
+        for attempt in range(1, self.chunk_attempts + 1):
+            try:
+                return self._get_or_create(chunk, lang, slow, tld, chunked=False, notify=False)
+            except Exception as e:
+                if attempt == self.chunk_attempts:
+                    raise
+                logging.warning(f"TTS chunk synthesis failed (attempt {attempt}), retrying: {e}")
+
+    def materialize(self, text, dest_path, lang='hi', slow=False, tld='com'):
+        """
+        Place a permanent copy of the cached audio for text at dest_path.
+        Uses a hard link where possible so no extra disk space is used and
+        later cache eviction does not remove the destination file.
+        """
+        filename = self.get_or_create(text, lang, slow, tld)
+        src_path = os.path.join(self.cache_dir, filename)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(src_path, dest_path)
+        except OSError:
+            shutil.copyfile(src_path, dest_path)
+        return dest_path
+
+    def _count_hit(self):
+        with self._stats_lock:
+            self.hits += 1
+
+    def stats(self):
+        """
+        Report cache hits/misses and synthesis latency for the active backend
+        """
+        with self._stats_lock:
+            return {
+                'backend': self.backend.name,
+                'hits': self.hits,
+                'misses': self.misses,
+                'synthesis_seconds': round(self.synthesis_seconds, 3),
+                'mean_synthesis_seconds': round(self.synthesis_seconds / self.misses, 3) if self.misses else None,
+            }
+
+    @staticmethod
+    def _touch(path):
+        # mtime doubles as last-used time for eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _maybe_evict(self):
+        with self._stats_lock:
+            due = (self._bytes_since_evict >= self.evict_bytes
+                   or time.monotonic() - self._last_evict >= self.evict_interval)
+            if not due:
+                return
+            self._bytes_since_evict = 0
+            self._last_evict = time.monotonic()
+        self.evict()
+
+    def evict(self):
+        """
+        Remove entries older than max_age, then the least recently used
+        entries until the cache fits in max_bytes. Entries used within
+        min_age are kept even if the cache stays over max_bytes.
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.time()
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if not (entry.name.startswith(self.PREFIX) and entry.name.endswith('.mp3')):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for mtime, size, path in entries:
+                if now - mtime <= self.max_age and total <= self.max_bytes:
+                    break
+                if now - mtime < self.min_age:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except FileNotFoundError:
+                    continue
+                if self.on_evict:
+                    self.on_evict(os.path.basename(path))
+
+            if removed:
+                logging.info(f"Evicted {removed} TTS cache entries")
+        finally:
+            self._evict_lock.release()
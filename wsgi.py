@@ -0,0 +1,6 @@
+"""
+WSGI entry point, e.g. `gunicorn wsgi:app`
+"""
+from app import app, start_background_services
+
+start_background_services()